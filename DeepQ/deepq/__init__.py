@@ -0,0 +1,7 @@
+from .config import Config
+from .game import Env, BatchEnv
+from .map_gen import generate_map, generate_maps, MapPool
+from .model import DRQN
+from .replay import ReplayMemory, Run
+from .agent import DRQN_Agent
+from .actors import ActorPool, play, play_batch
@@ -0,0 +1,258 @@
+import copy
+import queue
+import random
+from itertools import count
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from .agent import explore
+from .game import Env, BatchEnv
+from .map_gen import level_map
+
+
+class Rollout:
+    '''
+    Preallocated buffers for one episode of up to max_steps steps: the sensed rows
+    of every state (plus the last next state), one action and one reward per step
+    and, with keep_hiddens, the recurrent state before each step. Steps are
+    written in place into numpy arrays shared with their tensors, trimmed()
+    returns views of the recorded part (moved to `device` once, at the end).
+    '''
+    def __init__(self, max_steps, state_shape, device, keep_hiddens=False):
+        self.rows = state_shape[0]
+        self.device = device
+        self.states = np.zeros(((max_steps + 1) * self.rows,) + tuple(state_shape[1:]), dtype=np.float32)
+        self.actions = np.zeros(max_steps, dtype=np.int64)
+        self.rewards = np.zeros(max_steps, dtype=np.float32)
+        self.state_tensor = torch.from_numpy(self.states)
+        self.keep_hiddens = keep_hiddens
+        self.hiddens: torch.Tensor = None
+        self.steps = 0
+
+    def state(self, k):
+        state = self.state_tensor[k * self.rows:(k + 1) * self.rows]
+        return state if self.device.type == 'cpu' else state.to(self.device)
+
+    def hidden(self, k, i):
+        # i is the recurrent state after step k, so the one before step k + 1
+        if not self.keep_hiddens:
+            return
+        if self.hiddens is None:
+            self.hiddens = i[0].new_zeros((len(self.actions), len(i)) + i[0].shape)
+        if k + 1 < len(self.hiddens):
+            torch.stack(i, out=self.hiddens[k + 1])
+
+    def record(self, k, action, reward, next_state):
+        self.actions[k] = action
+        self.rewards[k] = reward
+        self.states[(k + 1) * self.rows:(k + 2) * self.rows] = next_state
+        self.steps = k + 1
+
+    def trimmed(self):
+        n = self.steps
+        states = self.state_tensor[:(n + 1) * self.rows].to(self.device)
+        actions = torch.from_numpy(self.actions[:n]).to(self.device)
+        rewards = torch.from_numpy(self.rewards[:n]).to(self.device)
+        hiddens = self.hiddens[:n] if self.hiddens is not None else None
+        return states, actions, rewards, hiddens
+
+
+def play(model, epsilon, table, device, keep_hiddens=False):
+    '''
+    Plays one episode on `table` choosing actions with model(state, i, epsilon).
+    Returns the states (3 sensed rows per step, plus the last next state), one
+    action and one reward per step and, with keep_hiddens, the recurrent state
+    before each step.
+    '''
+    game = Env(int_dir=True)
+
+    state, done = game.start(table)
+    run = Rollout(game.energy // len(game.movements) + 1, state.shape, device, keep_hiddens)
+    run.states[:len(state)] = state
+
+    i = None
+    for k in count():
+
+        # Select and perform an action
+        action, i = model(run.state(k), i, epsilon)
+        run.hidden(k, i)
+        action = int(action)
+
+        next_state, reward, done = game.step(action)
+        run.record(k, action, reward, next_state)
+
+        if done:
+            return run.trimmed()
+
+
+def play_batch(model, epsilon, maps, device, keep_hiddens=False):
+    '''
+    Plays one episode on each of `maps` at once with a BatchEnv, one call of
+    model(states, i, epsilon) per step for all the worlds (see
+    DRQN_Agent.select_actions). Returns one run per map, like play().
+    '''
+    game = BatchEnv()
+
+    state, done = game.reset(maps)
+    n, rows = state.shape[:2]
+    max_steps = game.energy.max() // rows + 1
+
+    states = np.zeros((n, (max_steps + 1) * rows, state.shape[2]), dtype=np.float32)
+    actions = np.zeros((n, max_steps), dtype=np.int64)
+    rewards = np.zeros((n, max_steps), dtype=np.float32)
+    steps = np.zeros(n, dtype=np.int64)
+    hiddens = None
+    states[:, :rows] = state
+    state_tensor = torch.from_numpy(states)
+
+    i = None
+    for k in count():
+        live = ~done
+
+        # Select and perform the actions of every world
+        action, i = model(state_tensor[:, k * rows:(k + 1) * rows].to(device), i, epsilon)
+        if keep_hiddens:
+            # i: (layers x B x hidden) each, kept as (B x steps x 2 x layers x hidden)
+            if hiddens is None:
+                hiddens = i[0].new_zeros((n, max_steps, len(i), i[0].shape[0], i[0].shape[2]))
+            if k + 1 < max_steps:
+                hiddens[:, k + 1] = torch.stack(i).permute(2, 0, 1, 3)
+        action = action.cpu().numpy()
+
+        next_state, reward, done = game.step(action)
+        actions[live, k] = action[live]
+        rewards[live, k] = reward[live]
+        states[live, (k + 1) * rows:(k + 2) * rows] = next_state[live]
+        steps[live] = k + 1
+
+        if done.all():
+            break
+
+    # copies, so every run owns its storage (and can be queued on its own)
+    return [
+        (state_tensor[b, :(m + 1) * rows].to(device, copy=True), torch.from_numpy(actions[b, :m]).to(device, copy=True),
+         torch.from_numpy(rewards[b, :m]).to(device, copy=True), hiddens[b, :m].clone() if keep_hiddens else None)
+        for b, m in enumerate(steps)
+    ]
+
+
+def epsilon_greedy(net, n_actions):
+    # same policy as DRQN_Agent.select_action, for a bare network
+    def select_action(state, i=None, epsilon=0):
+        with torch.no_grad():
+            x, i = net(state.view(-1, net.lstm.input_size), i)
+
+        if random.random() < epsilon:
+            return torch.tensor([random.randrange(n_actions)], dtype=torch.long), i
+        return x.max(1)[1][-1].view(1), i
+
+    return select_action
+
+
+def batched_epsilon_greedy(net):
+    # same policy as DRQN_Agent.select_actions, for a bare network
+    def select_actions(states, i=None, epsilon=0):
+        with torch.no_grad():
+            x, i = net(states, i)
+
+        return explore(x[:, -1], epsilon), i
+
+    return select_actions
+
+
+def actor(shared_net, version, epsilon, level, levels, maps, episodes, stop, n_actions, keep_hiddens, num_envs=1):
+    '''
+    Worker process: plays episodes on the CPU with a local copy of the learner's
+    network, refreshed whenever the learner publishes new weights, and puts
+    (level, run) on the episodes queue. With num_envs > 1 it plays that many
+    worlds at once with play_batch().
+    '''
+    torch.set_num_threads(1)
+    episodes.cancel_join_thread()
+
+    net = copy.deepcopy(shared_net)
+    select_action = epsilon_greedy(net, n_actions)
+    select_actions = batched_epsilon_greedy(net)
+    seen = -1
+
+    while not stop.is_set():
+        with version.get_lock():
+            if version.value != seen:
+                net.load_state_dict(shared_net.state_dict())
+                seen = version.value
+
+        lvl = level.value
+        if num_envs > 1:
+            runs = play_batch(select_actions, epsilon.value, [level_map(levels, lvl, maps) for _ in range(num_envs)],
+                              torch.device("cpu"), keep_hiddens)
+        else:
+            runs = [play(select_action, epsilon.value, level_map(levels, lvl, maps), torch.device("cpu"), keep_hiddens)]
+
+        for run in runs:
+            while not stop.is_set():
+                try:
+                    episodes.put((lvl, run), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+
+class ActorPool:
+    '''
+    Runs num_workers actor processes feeding one learner. The learner publishes its
+    weights with sync(), steers exploration and curriculum with set(), and collects
+    finished episodes with get()/drain(). Maps come from `maps` (a MapPool) when given,
+    every worker plays num_envs worlds at once.
+    '''
+    def __init__(self, net, num_workers, levels, n_actions, keep_hiddens=False, queue_size=None, maps=None,
+                 num_envs=1):
+        ctx = mp.get_context("spawn")
+
+        self.shared_net = copy.deepcopy(net).cpu()
+        self.shared_net.share_memory()
+
+        self.version = ctx.Value('i', 0)
+        self.epsilon = ctx.Value('d', 1.0)
+        self.level = ctx.Value('i', 0)
+        self.episodes = ctx.Queue(queue_size or 4 * num_workers * num_envs)
+        self.stop = ctx.Event()
+
+        self.workers = [
+            ctx.Process(target=actor, daemon=True,
+                        args=(self.shared_net, self.version, self.epsilon, self.level, levels, maps,
+                              self.episodes, self.stop, n_actions, keep_hiddens, num_envs))
+            for _ in range(num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def sync(self, net):
+        with self.version.get_lock():
+            for shared, param in zip(self.shared_net.state_dict().values(), net.state_dict().values()):
+                shared.copy_(param)
+            self.version.value += 1
+
+    def set(self, epsilon, level):
+        self.epsilon.value = epsilon
+        self.level.value = level
+
+    def get(self, timeout=None):
+        return self.episodes.get(timeout=timeout)
+
+    def drain(self):
+        runs = []
+        while True:
+            try:
+                runs.append(self.episodes.get_nowait())
+            except queue.Empty:
+                return runs
+
+    def close(self):
+        # episodes still queued are dropped, the workers exit without flushing them
+        self.stop.set()
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
@@ -0,0 +1,146 @@
+import random
+
+import torch
+import torch.optim as optim
+import torch.nn as nn
+
+from . import checkpoint
+from .config import Config
+from .replay import ReplayMemory
+
+
+def explore(q, epsilon):
+    # greedy actions of q (B x actions), each one swapped for a random action with probability epsilon
+    greedy = q.argmax(1)
+    random_actions = torch.randint_like(greedy, q.shape[1])
+    return torch.where(torch.rand(len(q), device=q.device) < epsilon, random_actions, greedy)
+
+
+class DRQN_Agent:
+    def __init__(self, net:nn.Module, config:Config, path=None):
+        self.config = config
+
+        self.target_net = net(self.config.n_states, self.config.n_actions).to(self.config.device)
+
+        if path:
+            self.q_net = torch.load(path, weights_only=False).to(self.config.device)
+        else:
+            self.q_net = net(self.config.n_states, self.config.n_actions).to(self.config.device)
+
+        self.target_net.load_state_dict(self.q_net.state_dict())
+        self.target_net.eval()
+
+        self.optimizer = optim.Adam(self.q_net.parameters(), lr=self.config.lr)
+        self.memory = ReplayMemory(self.config.rm_size, self.config.rm_rows, self.config.prioritized,
+                                   self.config.priority_alpha, device=self.config.device)
+
+        # rows of the sequence per env step (one per sensed direction)
+        self.step_rows = 3
+
+    def update_target_net(self):
+        self.target_net.load_state_dict(self.q_net.state_dict())
+
+    def add_to_memory(self, *args):
+        self.memory.push(*args)
+
+    def select_action(self, state, i=None, epsilon=0):
+        with torch.no_grad():
+            x, i = self.q_net(state.view(-1, self.config.n_states), i)
+
+        if random.random() < epsilon:
+            # Explore: take a random action
+            return torch.tensor([random.randrange(self.config.n_actions)], device=self.config.device, dtype=torch.long), i
+        else:
+            # Exploit: select the highest Q value
+            return x.max(1)[1][-1].view(1), i
+
+    def select_actions(self, states, i=None, epsilon=0):
+        '''
+        select_action for B environments in one network call: states (B x rows x states)
+        and their recurrent states i (layers x B x hidden). Returns B actions and the
+        new recurrent states.
+        '''
+        with torch.no_grad():
+            x, i = self.q_net(states, i)
+
+        return explore(x[:, -1], epsilon), i
+
+    def warm_up(self, net, window):
+        # runs the burn-in prefix without gradients, starting from the stored recurrent state
+        hidden = None
+        if window.hidden is not None:
+            hidden = tuple(h.transpose(0, 1).clone() for h in window.hidden.unbind(1))
+
+        burning = (window.burn_length > 0).nonzero().view(-1)
+        if not len(burning):
+            return hidden
+
+        if hidden is None:
+            shape = (net.lstm.num_layers, len(window.burn), net.lstm.hidden_size)
+            hidden = (window.burn.new_zeros(shape), window.burn.new_zeros(shape))
+
+        with torch.no_grad():
+            idx = burning.to(window.burn.device)
+            _, (h, c) = net(window.burn[idx], (hidden[0][:, idx], hidden[1][:, idx]), window.burn_length[burning])
+            hidden[0][:, idx], hidden[1][:, idx] = h, c
+
+        return hidden
+
+    def Q(self, window):
+        hidden = self.warm_up(self.q_net, window)
+
+        x, _ = self.q_net(window.states[:, :-self.step_rows], hidden, window.length)
+        return x.gather(2, window.actions.unsqueeze(2)).squeeze(2)
+
+    def target(self, window):
+        with torch.no_grad():
+            hidden = self.warm_up(self.target_net, window)
+
+            x, _ = self.target_net(window.states, hidden, window.length + self.step_rows)
+            Q_target = x[:, self.step_rows:].max(2)[0]
+
+        return (Q_target * self.config.gamma) + window.rewards
+
+    def optimize(self):
+        if len(self.memory) < self.config.batch_size:
+            return
+
+        if self.config.prioritized:
+            slots, weights = self.memory.sample_prioritized_slots(self.config.batch_size, self.config.priority_beta)
+        else:
+            slots = self.memory.sample_slots(self.config.batch_size)
+
+        # window.states.shape = (N x L + 3 x states), the last 3 rows only feed the target
+        # window.actions.shape = window.rewards.shape = (N x L)
+        window = self.memory.windows(slots, self.config.unroll, self.config.burn_in, self.step_rows)
+
+        self.optimizer.zero_grad()
+
+        y = self.Q(window)
+        yl = self.target(window)
+
+        # padded steps stay out of the loss
+        length = window.length.to(y.device)
+        mask = torch.arange(y.shape[1], device=y.device) < length.view(-1, 1)
+        td = (y - yl) * mask
+
+        if self.config.prioritized:
+            weights = torch.as_tensor(weights, dtype=td.dtype, device=td.device)
+            loss = (weights.view(-1, 1) * td.pow(2)).sum() / mask.sum()
+            self.memory.update_priorities(slots, (td.detach().abs().sum(1) / length).cpu().numpy())
+        else:
+            loss = td.pow(2).sum() / mask.sum()
+
+        loss.backward()
+        self.optimizer.step()
+
+        return loss.cpu().data.item()
+
+    def save(self, name):
+        torch.save(self.q_net, name)
+
+    def save_checkpoint(self, directory, **extra):
+        checkpoint.save(self, directory, **extra)
+
+    def load_checkpoint(self, directory):
+        return checkpoint.load(self, directory)
@@ -0,0 +1,52 @@
+import random
+import time
+
+import numpy as np
+
+from .game import Env, BatchEnv, baseMap
+
+'''
+Micro-benchmark: environment steps/sec on the 10x10 baseMap with random actions.
+    python -m deepq.bench_env [steps]
+'''
+
+
+def bench_env(env, steps):
+    env.start(baseMap, energy=10 ** 9)
+    actions = [random.randrange(6) for _ in range(steps)]
+
+    t = time.perf_counter()
+    for action in actions:
+        _, _, done = env.step(action)
+        if done:
+            env.start(baseMap, energy=10 ** 9)
+
+    return steps / (time.perf_counter() - t)
+
+
+def bench_batch(n, steps):
+    env = BatchEnv()
+    env.reset([baseMap] * n, energy=10 ** 9)
+    actions = np.random.randint(6, size=(steps // n, n))
+
+    live = 0  # worlds that already ended are stepped along but do not count
+    done = np.zeros(n, dtype=bool)
+    t = time.perf_counter()
+    for action in actions:
+        live += n - np.count_nonzero(done)
+        _, _, done = env.step(action)
+        if done.all():
+            _, done = env.reset([baseMap] * n, energy=10 ** 9)
+
+    return live / (time.perf_counter() - t)
+
+
+if __name__ == "__main__":
+    import sys
+
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    print(f"Env (str directions): {bench_env(Env(), steps):>12,.0f} steps/sec")
+    print(f"Env (int directions): {bench_env(Env(int_dir=True), steps):>12,.0f} steps/sec")
+    for n in (16, 256):
+        print(f"BatchEnv (N={n:>3d}):      {bench_batch(n, steps):>12,.0f} steps/sec")
@@ -0,0 +1,132 @@
+import os
+import shutil
+
+import numpy as np
+import torch
+
+'''
+Incremental checkpoints of a DRQN_Agent, in a directory:
+    state.pt              q_net, target_net and optimizer state_dicts, the replay
+                          bookkeeping (push counter, priorities) and the shard list
+    replay/<first id>/    one shard per save with the episodes pushed since the
+                          previous one: states, actions, rewards (and hiddens)
+                          concatenated as .npy, plus ids, rows and steps per episode
+Shards are written once and never touched again, so a save costs the new episodes
+plus state.pt. Shards whose episodes were all evicted are deleted. Resuming maps the
+shards (mmap_mode='r') and copies only the live episodes back into the memory.
+A directory belongs to one training run: saving a memory that is behind the
+checkpoint (e.g. a fresh agent) starts the shards over.
+'''
+
+fields = ('states', 'actions', 'rewards', 'hiddens')
+
+
+def write_shard(path, memory, slots):
+    rows = np.concatenate([np.arange(memory.start[s], memory.start[s] + memory.rows[s]) for s in slots])
+    steps = np.concatenate([np.arange(memory.start[s], memory.start[s] + memory.steps[s]) for s in slots])
+
+    # written aside and renamed, a shard either exists whole or not at all
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "ids.npy"), memory.ids[slots])
+    np.save(os.path.join(tmp, "rows.npy"), memory.rows[slots])
+    np.save(os.path.join(tmp, "steps.npy"), memory.steps[slots])
+    for name, idx in zip(fields, (rows, steps, steps, steps)):
+        data = getattr(memory, name)
+        if data is not None:
+            np.save(os.path.join(tmp, name + ".npy"), data[torch.from_numpy(idx).to(data.device)].cpu().numpy())
+    os.replace(tmp, path)
+
+
+def read_shard(path):
+    return {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r')
+            for name in os.listdir(path) if name.endswith(".npy")}
+
+
+def save(agent, directory, **extra):
+    '''
+    Checkpoints agent into directory, writing only the episodes pushed since the
+    last save. extra (e.g. epoch, curriculum level) is returned by load().
+    '''
+    memory = agent.memory
+    replay = os.path.join(directory, "replay")
+    os.makedirs(replay, exist_ok=True)
+
+    path = os.path.join(directory, "state.pt")
+    previous = torch.load(path, weights_only=False) if os.path.exists(path) else None
+    if previous is None or previous['pushed'] > memory.pushed:
+        shards, saved = [], 0
+    else:
+        shards, saved = previous['shards'], previous['pushed']
+
+    live = memory.slots()
+    oldest = memory.ids[live[0]] if len(live) else memory.pushed
+
+    new = live[memory.ids[live] >= saved]
+    if len(new):
+        name = f"{memory.ids[new[0]]:010d}"
+        write_shard(os.path.join(replay, name), memory, new)
+        shards.append((name, memory.ids[new[0]], memory.ids[new[-1]]))
+    shards = [shard for shard in shards if shard[2] >= oldest]
+
+    state = {
+        'q_net': agent.q_net.state_dict(),
+        'target_net': agent.target_net.state_dict(),
+        'optimizer': agent.optimizer.state_dict(),
+        'pushed': memory.pushed,
+        'oldest': oldest,
+        'shards': shards,
+        'dtype': memory.dtype,
+        'priorities': memory.tree.get(live) if memory.tree is not None else None,
+        'max_priority': memory.max_priority,
+        'extra': extra
+    }
+    torch.save(state, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+    # only once state.pt no longer points at them
+    keep = {shard[0] for shard in shards}
+    for name in os.listdir(replay):
+        if name not in keep:
+            shutil.rmtree(os.path.join(replay, name), ignore_errors=True)
+
+
+def load(agent, directory):
+    '''
+    Restores the networks, the optimizer and the live replay episodes saved in
+    directory into agent (its memory is cleared first). Returns the extra values
+    given to save().
+    '''
+    state = torch.load(os.path.join(directory, "state.pt"), weights_only=False, map_location=agent.config.device)
+    agent.q_net.load_state_dict(state['q_net'])
+    agent.target_net.load_state_dict(state['target_net'])
+    agent.optimizer.load_state_dict(state['optimizer'])
+
+    memory = agent.memory
+    memory.clear()
+    oldest = state['oldest']
+    for name, _, _ in state['shards']:
+        shard = read_shard(os.path.join(directory, "replay", name))
+        row_ends, step_ends = np.cumsum(shard['rows']), np.cumsum(shard['steps'])
+
+        for j in np.flatnonzero(shard['ids'] >= oldest):
+            rows = slice(row_ends[j] - shard['rows'][j], row_ends[j])
+            steps = slice(step_ends[j] - shard['steps'][j], step_ends[j])
+            hiddens = torch.from_numpy(np.array(shard['hiddens'][steps])) if 'hiddens' in shard else None
+
+            slot = memory.push(torch.from_numpy(np.array(shard['states'][rows])),
+                               torch.from_numpy(np.array(shard['actions'][steps])),
+                               torch.from_numpy(np.array(shard['rewards'][steps])), hiddens)
+            memory.ids[slot] = shard['ids'][j]
+
+    memory.pushed = state['pushed']
+    if state['dtype'] is not None:
+        memory.dtype = state['dtype']
+    if memory.tree is not None and state['priorities'] is not None:
+        # priorities were saved oldest first, one per live episode (their ids are consecutive)
+        live = memory.slots()
+        memory.tree.update(live, state['priorities'][memory.ids[live] - oldest])
+        memory.max_priority = state['max_priority']
+
+    return state['extra']
@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+
+import torch
+
+
+@dataclass
+class Config:
+    # Torch Parameters
+    device: torch.device
+
+    # Enviroment Parameters
+    n_states: int
+    n_actions: int
+
+    # Net Parameters
+    hidden_size = 64
+    hidden_layers = 1
+
+    # Memory Parameters
+    rm_size: int
+
+    # Learning Hyperparameters
+    batch_size: int
+    epochs: int
+    lr: float
+    gamma: float
+    update_rate: int
+    epsilon_decay_begin: int
+    epsilon_decay_end: int
+    epsilon: callable
+    save_rate: int
+    num_workers: int  # > 1 plays in that many actor processes while the learner optimizes
+    optimize_times: int
+    optimize_rate: int
+
+    # Replay Parameters
+    rm_rows: int = None
+    prioritized: bool = False
+    priority_alpha: float = 0.6
+    priority_beta: float = 0.4
+
+    # Sequence Parameters (in steps, unroll = None trains on whole episodes)
+    burn_in: int = 0
+    unroll: int = None
+
+    # Actor Parameters
+    sync_rate: int = 10  # learner iterations between publishing weights to the actors
+    num_envs: int = 1  # worlds played at once (BatchEnv) per actor or per epoch
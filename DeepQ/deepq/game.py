@@ -0,0 +1,340 @@
+import numpy as np
+import random
+
+'''
+# [ 0] = ⬜"inp_nothing"          **  sente nada (tem nada na casa requisitada)
+# [ 1] = 🌀"inp_breeze"           **  sente brisa (uma casa antes de um buraco)
+# [ 2] = 😈"inp_danger"           **  sente perigo (casa requisitada/atual tem um Wumpus ou um buraco - morre)
+# [ 3] = ✨"inp_flash"            **  sente flash (uma casa antes do ouro ele vê o brilho do ouro)
+# [ 4] = 🏆"inp_goal"             **  sente meta (casa requisitada/atual tem ouro - reward, que é a meta)
+# [ 5] = 🏁"inp_initial"          **  sente início (casa requisitada/atual é o ponto de partida/saída)
+# [ 6] = ⬛"inp_obstruction"      **  sente obstução (mandou request,d e vem obstrução é porque vai colidir em 'd')
+# [ 7] = 🦨"inp_stench"           **  sente fedor (uma casa antes de um Wumpus)
+# [ 8] = ✨"inp_bf"               **  sente brisa/flash (na casa 'd' tem sinais de brisa e flash)
+# [ 9] = ✨"inp_bfs"              **  sente brisa/flash/stench (na casa 'd' tem brisa + flash + fedor)
+# [10] = 🌀"inp_bs"               **  sente brisa/stench (na casa 'd' tem brisa + fedor)
+# [11] = ✨"inp_fs"               **  sente flash/stench (na casa 'd' tem flash + fedor)
+# [12] = ❌"inp_boundary"         **  colidiu com borda (mandou mover forward,d e colidiu com a borda do EnviSim)
+
+# [ 0] = "out_act_grab"         **  ação de pegar/agarrar o ouro (reward)
+# [ 1] = "out_act_leave"        **  ação de deixar a caverna (no mesmo local de partida)
+# [ 3] = "out_mov_forward"      **  ação de mover adiante
+# [11] = "out_rot_left"         **  ação de rotacionar esq.{"rotate":["left",2]}=90°; {"rotate":["left",1]}=45°
+# [12] = "out_rot_right"        **  ação de rotacionar esq.{"rotate":["right",2]}=90°; {"rotate":["right",1]}=45°
+# [13] = "out_rot_back"         **  ação de rotacionar back.{"rotate":["back",0]}={"rotate":["right",4]}=180°
+'''
+
+baseMap = np.array([
+    [0,7,0,1,2,1,0,0,1,0],
+    [7,2,7,0,1,0,0,1,2,1],
+    [0,7,0,0,0,0,0,1,1,0],
+    [0,0,0,5,0,0,1,2,1,0],
+    [0,1,0,0,0,0,0,10,0,0],
+    [1,2,1,0,0,0,7,2,7,0],
+    [0,1,7,0,0,0,1,11,0,0],
+    [0,7,2,7,0,1,2,4,3,0],
+    [0,0,7,0,0,0,1,3,0,0],
+    [0,0,0,0,0,0,0,0,0,0]
+])
+
+person_dict = {'u' : '⬆️', 'd' : '⬇️', 'l' : '⬅️', 'r' : '➡️'}
+char_vector = ['⬜','🌀','😈','✨','🏆','🏁','⬛','🦨', '✨', '✨', '🌀', '✨', '❌']
+
+def print_state(map, pos, direction):
+    for i in range(map.shape[0]):
+        for j in range(map.shape[1]):
+            if (i, j) == pos:
+                print(person_dict[direction], end='  ')
+            else:
+                print(char_vector[map[i][j]], end=' ')
+        print()
+
+class Env:
+    def __init__(self, int_dir=False):
+        # int_dir: keep the direction as an index into self.directions and sense
+        # through a neighbour table built in start() (the returned sense vector is
+        # then a buffer reused by every call)
+        self.int_dir = int_dir
+        self.directions = ['u', 'r', 'd', 'l']
+        self.dir_dic = {
+            'u': (-1, 0),
+            'd': (1, 0),
+            'l': (0, -1),
+            'r': (0, 1)
+        }
+        self.movements = ['f', 'l', 'r']
+        self.reverse_dir_dic = {
+            (-1, 0): 'u',
+            (1, 0): 'd',
+            (0, -1): 'l',
+            (0, 1): 'r'
+        }
+        self.looks = {'f': 0, 'r': 1, 'b': 2, 'l': 3}
+        self.offsets = np.array([[-1, 0], [0, 1], [1, 0], [0, -1]])
+
+        self.map: np.ndarray = None
+        self.padded: np.ndarray = None
+        self.neighbours: np.ndarray = None
+        self.vectors: np.ndarray = None
+        self.buffer: np.ndarray = None
+        self.energy: int = None
+        self.grabbed: bool = None
+        self.dir: str | int = None
+        self.pos: tuple[int, int] = None
+
+    def start(self, table, energy=500):
+        self.map = table
+        self.energy = energy
+        self.grabbed = False
+
+        x, y = np.where(self.map == 5)
+        self.pos = (x[0], y[0])
+
+        if self.int_dir:
+            self.dir = random.randrange(4)
+            self.build_tables()
+        else:
+            self.dir = random.choice(self.directions)
+
+        return self.sense_vector(self.movements), False
+
+    def build_tables(self):
+        # neighbours[x, y, d] is what sense(d) returns standing on (x, y)
+        self.padded = np.pad(self.map, 1, constant_values=-1)
+        h, w = self.map.shape
+        rows, cols = np.mgrid[1:h + 1, 1:w + 1]
+        cells = self.padded[rows[..., None] + self.offsets[:, 0], cols[..., None] + self.offsets[:, 1]]
+        self.neighbours = np.where(cells < 0, 6, cells)
+
+        # vectors[x, y, d] is the sense vector for self.movements facing d
+        looks = np.array([self.looks[m] for m in self.movements])
+        cells = self.neighbours[:, :, (np.arange(4)[:, None] + looks) % 4]
+        self.vectors = (cells[..., None] == np.arange(13)).astype(np.int32)
+        self.buffer = np.zeros((len(self.movements), 13), dtype=np.int32)
+
+    def sense_vector(self, orientation):
+        if self.int_dir:
+            return self.sense_vector_int(orientation)
+
+        vector = np.zeros((len(orientation), 13), dtype=np.int32)
+        for i, j in enumerate(orientation):
+            if j == 'f':
+                vector[i, self.sense(self.dir)] = 1
+            elif j == 'l':
+                vector[i, self.sense(self.directions[(self.directions.index(self.dir) - 1) % 4])] = 1
+            elif j == 'r':
+                vector[i, self.sense(self.directions[(self.directions.index(self.dir) + 1) % 4])] = 1
+            elif j == 'b':
+                vector[i, self.sense(self.directions[(self.directions.index(self.dir) + 2) % 4])] = 1
+        self.energy -= len(self.movements)
+
+        return vector
+
+    def sense_vector_int(self, orientation):
+        if orientation is self.movements:
+            vector = self.buffer
+            np.copyto(vector, self.vectors[self.pos[0], self.pos[1], self.dir])
+        else:
+            vector = np.zeros((len(orientation), 13), dtype=np.int32)
+            looks = [(self.dir + self.looks[j]) % 4 for j in orientation]
+            vector[np.arange(len(vector)), self.neighbours[self.pos][looks]] = 1
+        self.energy -= len(self.movements)
+
+        return vector
+
+    def sense(self, dir=None):
+        if dir is None:
+            return self.map[self.pos]
+
+        if self.int_dir:
+            return self.neighbours[self.pos][dir]
+
+        shape = self.map.shape
+        dir = self.dir_dic[dir]
+        dest = (self.pos[0] + dir[0], self.pos[1] + dir[1])
+
+        if dest[0] < 0 or dest[1] < 0 or shape[0] <= dest[0] or shape[1] <= dest[1]:
+            return 6
+
+        return self.map[dest]
+
+    def move(self, command):
+        if self.int_dir:
+            return self.move_int(command)
+
+        reward = 0
+        end = False
+
+        # turn
+        if command == 11:
+            self.dir = self.directions[self.directions.index(self.dir) - 1]
+        elif command == 12:
+            self.dir = self.directions[(self.directions.index(self.dir) + 1) % 4]
+        elif command == 13:
+            self.dir = self.directions[(self.directions.index(self.dir) + 2) % 4]
+
+        # forward
+        elif command == 3:
+            shape = self.map.shape
+            calc_dir = self.dir_dic[self.dir]
+            dest = (self.pos[0] + calc_dir[0], self.pos[1] + calc_dir[1])
+            if 0 <= dest[0] < shape[0] and 0 <= dest[1] < shape[1]:
+                self.pos = (self.pos[0] + calc_dir[0], self.pos[1] + calc_dir[1])
+                self.dir = self.reverse_dir_dic[calc_dir]
+
+        # grab
+        elif command == 0:
+            if self.map[self.pos] == 4:
+                if not self.grabbed:
+                    reward = 50
+                self.grabbed = True
+
+        # leave
+        elif command == 1:
+            if self.map[self.pos] == 5 and self.grabbed:
+                reward = 50
+                end = True
+
+        # check death
+        if self.map[self.pos] == 2:
+            reward = -20
+            end = True
+
+        return reward, end
+
+    def move_int(self, command):
+        reward = 0
+        end = False
+
+        # turn
+        if command == 11:
+            self.dir = (self.dir - 1) % 4
+        elif command == 12:
+            self.dir = (self.dir + 1) % 4
+        elif command == 13:
+            self.dir = (self.dir + 2) % 4
+
+        # forward
+        elif command == 3:
+            dest = (self.pos[0] + self.offsets[self.dir, 0], self.pos[1] + self.offsets[self.dir, 1])
+            if self.padded[dest[0] + 1, dest[1] + 1] >= 0:
+                self.pos = dest
+
+        # grab
+        elif command == 0:
+            if self.map[self.pos] == 4:
+                if not self.grabbed:
+                    reward = 50
+                self.grabbed = True
+
+        # leave
+        elif command == 1:
+            if self.map[self.pos] == 5 and self.grabbed:
+                reward = 50
+                end = True
+
+        # check death
+        if self.map[self.pos] == 2:
+            reward = -20
+            end = True
+
+        return reward, end
+
+    def step(self, action):
+        reward, done = self.move([0, 1, 3, 11, 12, 13][action])
+        state = self.sense_vector(self.movements)
+
+        if self.energy <= 0:
+            done = True
+
+        return state, reward, done
+
+
+class BatchEnv:
+    '''
+    Steps N independent worlds at once. Same rules as Env, but the state of every
+    world lives in stacked arrays: maps are padded with a -1 border (read as 6 when
+    sensed, blocks movement) and positions are flat indices into the padded map.
+    '''
+    def __init__(self):
+        # same order as Env.directions: u, r, d, l
+        self.commands = np.array([0, 1, 3, 11, 12, 13])
+        self.turns = np.zeros(14, dtype=np.int64)
+        self.turns[[11, 12, 13]] = [3, 1, 2]
+        self.looks = np.array([0, 3, 1])  # Env.movements: 'f', 'l', 'r'
+
+        self.map: np.ndarray = None
+        self.offsets: np.ndarray = None
+        self.energy: np.ndarray = None
+        self.grabbed: np.ndarray = None
+        self.done: np.ndarray = None
+        self.dir: np.ndarray = None
+        self.pos: np.ndarray = None
+        self.rows: np.ndarray = None
+
+    def reset(self, maps, energy=500):
+        n = len(maps)
+        h = max(m.shape[0] for m in maps) + 2
+        w = max(m.shape[1] for m in maps) + 2
+
+        padded = np.full((n, h, w), -1, dtype=np.int64)
+        for i, m in enumerate(maps):
+            padded[i, 1:m.shape[0] + 1, 1:m.shape[1] + 1] = m
+        self.map = padded.reshape(n, -1)
+        self.offsets = np.array([-w, 1, w, -1])
+
+        self.rows = np.arange(n)
+        self.energy = np.full(n, energy)
+        self.grabbed = np.zeros(n, dtype=bool)
+        self.done = np.zeros(n, dtype=bool)
+        self.dir = np.random.randint(4, size=n)
+        self.pos = (self.map == 5).argmax(1)
+
+        return self.sense_vector(), self.done.copy()
+
+    def sense_vector(self):
+        look = (self.dir[:, None] + self.looks) % 4
+        cells = self.map[self.rows[:, None], self.pos[:, None] + self.offsets[look]]
+        cells[cells < 0] = 6
+
+        vector = np.zeros((len(self.rows), len(self.looks), 13), dtype=np.int32)
+        vector[self.rows[:, None], np.arange(len(self.looks)), cells] = 1
+        self.energy[~self.done] -= len(self.looks)
+
+        return vector
+
+    def move(self, commands):
+        live = ~self.done
+
+        # turn
+        self.dir = np.where(live, (self.dir + self.turns[commands]) % 4, self.dir)
+
+        # forward
+        dest = self.pos + self.offsets[self.dir]
+        forward = live & (commands == 3) & (self.map[self.rows, dest] >= 0)
+        self.pos = np.where(forward, dest, self.pos)
+        here = self.map[self.rows, self.pos]
+
+        # grab
+        grab = live & (commands == 0) & (here == 4)
+        reward = np.where(grab & ~self.grabbed, 50, 0)
+        self.grabbed |= grab
+
+        # leave
+        end = live & (commands == 1) & (here == 5) & self.grabbed
+        reward[end] = 50
+
+        # check death
+        dead = live & (here == 2)
+        reward[dead] = -20
+        end |= dead
+
+        return reward, end
+
+    def step(self, actions):
+        reward, end = self.move(self.commands[np.asarray(actions)])
+        state = self.sense_vector()
+
+        self.done |= end | (self.energy <= 0)
+
+        return state, reward, self.done.copy()
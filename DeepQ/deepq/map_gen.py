@@ -0,0 +1,124 @@
+import os
+import random
+
+import numpy as np
+
+'''
+Random Wumpus worlds with the same codes as game.baseMap:
+start (5), gold (4), n_obstacles danger cells (2, the first one is the Wumpus and
+the others are pits) and the hints on the free cells around them: breeze (1) next
+to a pit, stench (7) next to the Wumpus, flash (3) next to the gold and the
+combined codes 8 (bf), 9 (bfs), 10 (bs) and 11 (fs).
+'''
+
+# hint code indexed by breeze * 4 + flash * 2 + stench
+hint_codes = np.array([0, 7, 3, 11, 1, 10, 8, 9])
+
+
+def spread(mask):
+    # marks the 4-neighbours of every set cell in the last two axes
+    padded = np.pad(mask, [(0, 0)] * (mask.ndim - 2) + [(1, 1), (1, 1)])
+    return padded[..., :-2, 1:-1] | padded[..., 2:, 1:-1] | padded[..., 1:-1, :-2] | padded[..., 1:-1, 2:]
+
+
+def reachable(maps):
+    '''
+    Breadth-first flood fill from the start over the cells without danger, one
+    layer per iteration for all the maps at once. True where the gold is reachable
+    (and so is the way back).
+    '''
+    maps = np.asarray(maps)
+    free = maps != 2
+    reach = maps == 5
+    while True:
+        grown = reach | spread(reach) & free
+        if (grown == reach).all():
+            break
+        reach = grown
+
+    return (reach & (maps == 4)).any(axis=(-2, -1))
+
+
+def generate_maps(size, n_obstacles, solvable=True):
+    '''
+    One size x size map per entry of n_obstacles. Every cell gets a random rank:
+    rank 0 is the start, 1 the gold, 2 the Wumpus and up to 1 + n_obstacles pits.
+    With solvable, maps whose gold can't be reached are drawn again.
+    '''
+    n_obstacles = np.minimum(np.asarray(n_obstacles).reshape(-1, 1, 1), size * size - 2)
+    maps = np.empty((len(n_obstacles), size, size), dtype=np.int64)
+    todo = np.arange(len(maps))
+
+    while len(todo):
+        n = n_obstacles[todo]
+        rank = np.random.random((len(todo), size * size)).argsort(1).argsort(1).reshape(-1, size, size)
+
+        start, gold = rank == 0, rank == 1
+        wumpus = (rank == 2) & (n > 0)
+        pits = (rank > 2) & (rank < n + 2)
+
+        hints = spread(pits) * 4 + spread(gold) * 2 + spread(wumpus)
+        new = hint_codes[hints]
+        new[wumpus | pits] = 2
+        new[gold] = 4
+        new[start] = 5
+        maps[todo] = new
+
+        todo = todo[~reachable(new)] if solvable else todo[:0]
+
+    return maps
+
+
+def generate_map(size, n_obstacles, solvable=True):
+    return generate_maps(size, [n_obstacles], solvable)[0]
+
+
+class MapPool:
+    '''
+    Pre-generated maps for every curriculum level, kept as .npy files in
+    `directory` (built on first use) and memory-mapped, so starting an episode is
+    an index lookup. Level (size, max_obstacles) holds `count` maps with a uniform
+    number of obstacles in [0, max_obstacles], like the on-the-fly maps.
+    Pickles as its file paths, so worker processes map the same files.
+    '''
+    def __init__(self, directory, levels, count=10000):
+        self.directory = directory
+        self.levels = levels
+        self.count = count
+
+        os.makedirs(directory, exist_ok=True)
+        for size, max_obstacles in levels:
+            path = self.path(size, max_obstacles)
+            if not os.path.exists(path):
+                maps = generate_maps(size, np.random.randint(0, max_obstacles + 1, count))
+                np.save(path + ".tmp.npy", maps.astype(np.int8))
+                os.replace(path + ".tmp.npy", path)
+
+        self.maps = None
+        self.open()
+
+    def path(self, size, max_obstacles):
+        return os.path.join(self.directory, f"maps_{size}x{size}_{max_obstacles}_{self.count}.npy")
+
+    def open(self):
+        self.maps = [np.load(self.path(*level), mmap_mode='r') for level in self.levels]
+
+    def sample(self, level):
+        maps = self.maps[level]
+        return maps[random.randrange(len(maps))]
+
+    def __getstate__(self):
+        return {'directory': self.directory, 'levels': self.levels, 'count': self.count}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+
+def level_map(levels, level, pool=None):
+    # a map for the curriculum level, from the pool when there is one
+    if pool is not None:
+        return pool.sample(level)
+
+    size, max_obstacles = levels[level]
+    return generate_map(size, random.randint(0, max_obstacles))
@@ -0,0 +1,25 @@
+import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+
+class DRQN(nn.Module):
+    def __init__(self, input_size, output_size, hidden_size=128, hidden_layers=1):
+        super(DRQN, self).__init__()
+        self.lstm = nn.LSTM(input_size, hidden_size, hidden_layers, batch_first=True)
+        self.out = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x, i=None, lengths=None):
+        # lengths: true length of each padded sequence in the batch, packs x so the
+        # LSTM stops at the last real step of each one
+        if lengths is not None:
+            total = x.shape[1]
+            x = pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+
+        if i is not None:
+            x, i = self.lstm(x, i)
+        else:
+            x, i = self.lstm(x)
+
+        if lengths is not None:
+            x, _ = pad_packed_sequence(x, batch_first=True, total_length=total)
+        return self.out(x), i
@@ -0,0 +1,253 @@
+import random
+from collections import namedtuple
+
+import numpy as np
+import torch
+
+Run = namedtuple("Run", ('states', 'actions', 'rewards'))
+Window = namedtuple("Window", ('burn', 'burn_length', 'states', 'length', 'actions', 'rewards', 'hidden'))
+
+
+class SumTree:
+    '''
+    Binary sum tree over `capacity` leaves (rounded up to a power of two).
+    tree[1] is the total priority, leaf i lives at tree[size + i].
+    '''
+    def __init__(self, capacity):
+        self.size = 1 << max(capacity - 1, 0).bit_length()
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size)
+
+    def total(self):
+        return self.tree[1]
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.size]
+
+    def update(self, idx, priority):
+        idx = np.asarray(idx) + self.size
+        self.tree[idx] = priority
+        for _ in range(self.depth):
+            idx = np.unique(idx // 2)
+            self.tree[idx] = self.tree[2 * idx] + self.tree[2 * idx + 1]
+
+    def find(self, values):
+        # walks down all the values at once, one level per iteration
+        idx = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = self.tree[2 * idx]
+            right = values >= left
+            values = np.where(right, values - left, values)
+            idx = 2 * idx + right
+
+        return idx - self.size
+
+
+class ReplayMemory():
+    '''
+    Ring buffer of whole episodes (Run). The steps of every episode are written
+    contiguously into preallocated tensors and each episode slot only keeps an
+    offset and a length, so sample() returns views and costs O(batch_size).
+
+    capacity: maximum number of episodes
+    max_rows: rows preallocated for the states (defaults to 512 per episode)
+    prioritized: keep a sum tree of per episode priorities for sample_prioritized()
+    state_dtype: optional storage dtype for the states (e.g. torch.uint8 for one-hot
+                 senses), sampled states are cast back to the pushed dtype
+
+    Episodes can be pushed with the recurrent state the actor had before each step
+    (hiddens), windows() then cuts fixed length burn-in/unroll sequences from them.
+    '''
+    def __init__(self, capacity, max_rows=None, prioritized=False, alpha=0.6, eps=1e-3,
+                 device=None, state_dtype=None):
+        self.capacity = capacity
+        self.max_rows = max_rows or 512 * capacity
+        self.device = device
+        self.state_dtype = state_dtype
+
+        self.start = np.zeros(capacity, dtype=np.int64)
+        self.rows = np.zeros(capacity, dtype=np.int64)
+        self.steps = np.zeros(capacity, dtype=np.int64)
+        self.ids = np.zeros(capacity, dtype=np.int64)  # push counter of the episode in each slot
+        self.pushed = 0
+        self.first = 0  # slot of the oldest episode
+        self.size = 0
+        self.cursor = 0  # next free row
+
+        self.states: torch.Tensor = None
+        self.actions: torch.Tensor = None
+        self.rewards: torch.Tensor = None
+        self.hiddens: torch.Tensor = None
+        self.dtype: torch.dtype = None
+
+        self.alpha = alpha
+        self.eps = eps
+        self.max_priority = 1.0
+        self.tree = SumTree(capacity) if prioritized else None
+
+    def allocate(self, states, actions, rewards):
+        device = self.device or states.device
+        self.dtype = states.dtype
+        self.states = torch.zeros((self.max_rows,) + states.shape[1:], device=device,
+                                  dtype=self.state_dtype or states.dtype)
+        self.actions = torch.zeros((self.max_rows,) + actions.shape[1:], device=device, dtype=actions.dtype)
+        self.rewards = torch.zeros((self.max_rows,) + rewards.shape[1:], device=device, dtype=rewards.dtype)
+
+    def allocate_hiddens(self, hiddens):
+        self.hiddens = torch.zeros((self.max_rows,) + hiddens.shape[1:], device=self.states.device,
+                                   dtype=hiddens.dtype)
+
+    def clear(self):
+        # drops every episode, the preallocated storage is kept
+        self.first = self.size = self.cursor = self.pushed = 0
+        if self.tree is not None:
+            self.tree = SumTree(self.capacity)
+        self.max_priority = 1.0
+
+    def pop(self):
+        if self.tree is not None:
+            self.tree.update([self.first], 0)
+        self.first = (self.first + 1) % self.capacity
+        self.size -= 1
+
+    def push(self, states, actions, rewards, hiddens=None):
+        n = len(states)
+        if n > self.max_rows:
+            raise ValueError(f"episode with {n} rows does not fit in {self.max_rows} rows")
+        if self.states is None:
+            self.allocate(states, actions, rewards)
+        if hiddens is not None and self.hiddens is None:
+            self.allocate_hiddens(hiddens)
+
+        if self.size == self.capacity:
+            self.pop()
+
+        # no room left at the end: start over from row 0, everything stored after the
+        # cursor is older than what is stored before it
+        wrapped = self.cursor + n > self.max_rows
+        end = self.cursor
+        if wrapped:
+            self.cursor = 0
+
+        while self.size:
+            s = self.start[self.first]
+            if wrapped and s >= end or s < self.cursor + n and self.cursor < s + self.rows[self.first]:
+                self.pop()
+            else:
+                break
+
+        slot = (self.first + self.size) % self.capacity
+        self.start[slot] = self.cursor
+        self.rows[slot] = n
+        self.steps[slot] = len(actions)
+        self.ids[slot] = self.pushed
+        self.pushed += 1
+
+        self.states[self.cursor:self.cursor + n] = states
+        self.actions[self.cursor:self.cursor + len(actions)] = actions
+        self.rewards[self.cursor:self.cursor + len(rewards)] = rewards
+        if hiddens is not None:
+            self.hiddens[self.cursor:self.cursor + len(hiddens)] = hiddens
+
+        self.cursor += n
+        self.size += 1
+
+        if self.tree is not None:
+            self.tree.update([slot], self.max_priority)
+
+        return slot
+
+    def slots(self):
+        # live slots, oldest first
+        return (self.first + np.arange(self.size)) % self.capacity
+
+    def get(self, slot):
+        s, n, m = self.start[slot], self.rows[slot], self.steps[slot]
+        states = self.states[s:s + n]
+        if self.state_dtype is not None:
+            states = states.to(self.dtype)
+
+        return Run(states, self.actions[s:s + m], self.rewards[s:s + m])
+
+    def sample_slots(self, batch_size):
+        return (self.first + np.array(random.sample(range(self.size), batch_size))) % self.capacity
+
+    def sample(self, batch_size):
+        return [self.get(slot) for slot in self.sample_slots(batch_size)]
+
+    def sample_prioritized_slots(self, batch_size, beta=0.4):
+        '''
+        Samples episode slots with probability proportional to their priority.
+        Returns the slots (for update_priorities) and the normalized importance
+        sampling weights.
+        '''
+        total = self.tree.total()
+        slots = self.tree.find(np.random.uniform(0, total, batch_size))
+
+        weights = (self.size * self.tree.get(slots) / total) ** -beta
+        weights /= weights.max()
+
+        return slots, weights
+
+    def sample_prioritized(self, batch_size, beta=0.4):
+        slots, weights = self.sample_prioritized_slots(batch_size, beta)
+        return [self.get(slot) for slot in slots], slots, weights
+
+    def windows(self, slots, unroll=None, burn_in=0, step_rows=1):
+        '''
+        Cuts one sequence per slot, R2D2 style: a random start step k, up to
+        `burn_in` steps before it to warm up the recurrent state and up to `unroll`
+        steps from it to train on (unroll=None takes the whole episode from k=0).
+        A step is `step_rows` rows of states and one action/reward, the states hold
+        one extra step at the end (the last next state).
+
+        Returns a Window of padded tensors gathered in one indexing op each:
+            burn (B, burn_in * step_rows, ...), burn_length (B,)
+            states (B, unroll * step_rows + step_rows, ...), length (B,) of the
+                unrolled rows (the states carry step_rows more for the target)
+            actions, rewards (B, unroll * step_rows, ...) repeated for every row of
+                their step, so they line up with the states
+            hidden (B, ...) stored before the first burn-in step, or None
+        '''
+        slots = np.asarray(slots)
+        start = self.start[slots]
+        steps = self.steps[slots]
+
+        if unroll is None:
+            first = np.zeros_like(steps)
+            unroll = steps.max()
+        else:
+            first = (np.random.random(len(slots)) * steps).astype(np.int64)
+        warm = np.maximum(first - burn_in, 0)
+        last = np.minimum(first + unroll, steps)
+
+        burn_length = (first - warm) * step_rows
+        length = (last - first) * step_rows
+
+        def gather(data, begin, size, width, per=1):
+            # `per` rows of the window read the same entry of data
+            width = max(width, 1)
+            rows = np.minimum(np.arange(width), np.maximum(size - 1, 0)[:, None]) // per
+            rows = start[:, None] + begin[:, None] + rows
+            return data[torch.from_numpy(rows).to(data.device)]
+
+        burn = gather(self.states, warm * step_rows, burn_length, burn_length.max())
+        states = gather(self.states, first * step_rows, length + step_rows, length.max() + step_rows)
+        actions = gather(self.actions, first, length, length.max(), step_rows)
+        rewards = gather(self.rewards, first, length, length.max(), step_rows)
+        if self.state_dtype is not None:
+            burn, states = burn.to(self.dtype), states.to(self.dtype)
+
+        hidden = None
+        if self.hiddens is not None:
+            hidden = self.hiddens[torch.from_numpy(start + warm).to(self.hiddens.device)]
+
+        return Window(burn, torch.from_numpy(burn_length), states, torch.from_numpy(length), actions, rewards, hidden)
+
+    def update_priorities(self, slots, td_errors):
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(slots, priorities)
+        self.max_priority = max(self.max_priority, priorities.max())
+
+    def __len__(self):
+        return self.size
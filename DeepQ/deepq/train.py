@@ -0,0 +1,195 @@
+import argparse
+import os
+import random
+from functools import partial
+
+import numpy as np
+import torch
+
+from .actors import ActorPool, play, play_batch
+from .agent import DRQN_Agent
+from .config import Config
+from .map_gen import MapPool, level_map
+from .model import DRQN
+
+'''
+Headless DRQN training:
+    python -m deepq.train --epochs 3000 --num-workers 4 --save net.pt
+'''
+
+# curriculum: (map size, max number of obstacles)
+levels = [
+    (3, 0),
+    (3, 1),
+    (5, 1),
+    (5, 2),
+    (7, 3),
+    (7, 5),
+    (10, 7)
+]
+
+
+def linear_epsilon(x, decay=.002):
+    return 1 - decay * x
+
+
+def train(agent, config, levels=levels, save_path="net.pt", log_every=1, maps=None, checkpoint=None):
+    '''
+    With a checkpoint directory, training resumes from it when it exists (networks,
+    optimizer, replay, epoch and level) and is checkpointed every save_rate epochs.
+    '''
+    train_log = {
+        'ep': [],
+        'reward': [],
+        'loss': [],
+        'size': [],
+        'n_obs': []
+    }
+
+    current_lvl, begin = 0, 0
+    if checkpoint is not None and os.path.exists(os.path.join(checkpoint, "state.pt")):
+        extra = agent.load_checkpoint(checkpoint)
+        current_lvl, begin = extra.get('level', 0), extra.get('epoch', -1) + 1
+
+    # actor/learner mode: the workers keep playing with the last published weights
+    # while this loop only collects their episodes and optimizes
+    pool = None
+    if config.num_workers > 1:
+        pool = ActorPool(agent.q_net, config.num_workers, levels, config.n_actions, config.unroll is not None,
+                         maps=maps, num_envs=config.num_envs)
+
+    epoch = begin - 1
+    try:
+        for epoch in range(begin, config.epochs):
+            epsilon = config.epsilon(epoch)
+            size, max_obstacles = levels[current_lvl]
+
+            if pool is not None:
+                pool.set(epsilon, current_lvl)
+                runs = pool.drain()
+                if not runs and len(agent.memory) < config.batch_size:
+                    runs = [pool.get()]
+            elif config.num_envs > 1:
+                maps_batch = [level_map(levels, current_lvl, maps) for _ in range(config.num_envs)]
+                runs = [(current_lvl, run) for run in play_batch(agent.select_actions, epsilon, maps_batch,
+                                                                 config.device, config.unroll is not None)]
+            else:
+                runs = [(current_lvl, play(agent.select_action, epsilon, level_map(levels, current_lvl, maps),
+                                           config.device, config.unroll is not None))]
+
+            log = {
+                'loss': [],
+                'reward': 0
+            }
+
+            for lvl, out in runs:
+                reward = torch.sum(out[2]).cpu().data.item()
+                log['reward'] += reward / len(runs)
+                agent.add_to_memory(*out)
+
+                if lvl == current_lvl and reward >= 50:
+                    current_lvl = min(current_lvl + 1, len(levels) - 1)
+
+            for _ in range(config.optimize_times):
+                log['loss'].append(agent.optimize())
+
+            log["loss"] = np.asarray(log["loss"])
+            log["loss"] = log["loss"][log["loss"] != np.array(None)]
+            train_log['ep'].append(epoch)
+            train_log['loss'].append(log['loss'])
+            train_log['reward'].append(log['reward'])
+            train_log['size'].append(size)
+            train_log['n_obs'].append(max_obstacles)
+
+            if not epoch % log_every:
+                loss = log['loss'].astype(float).mean() if len(log['loss']) else float('nan')
+                print(f"Epoch {epoch:>5d} - Epsilon {epsilon:>5.2f} - Level {current_lvl} - "
+                      f"Reward {log['reward']:>7.1f} - Loss {loss:.4f}")
+
+            # Update the target network, copying all weights and biases in DQN
+            if not epoch % config.update_rate:
+                agent.update_target_net()
+
+            if not epoch % config.save_rate:
+                agent.save(save_path)
+                if checkpoint is not None:
+                    agent.save_checkpoint(checkpoint, epoch=epoch, level=current_lvl)
+
+            if pool is not None and not epoch % config.sync_rate:
+                pool.sync(agent.q_net)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    agent.save(save_path)
+    if checkpoint is not None:
+        agent.save_checkpoint(checkpoint, epoch=epoch, level=current_lvl)
+    return train_log
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a DRQN agent on random Wumpus worlds.")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--load", default=None, help="network to resume from")
+    parser.add_argument("--save", default="net.pt")
+    parser.add_argument("--checkpoint", default=None, help="directory to checkpoint into and resume from")
+    parser.add_argument("--epochs", type=int, default=3000)
+    parser.add_argument("--rm-size", type=int, default=100)
+    parser.add_argument("--rm-rows", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=0.002)
+    parser.add_argument("--gamma", type=float, default=0.8)
+    parser.add_argument("--eps-decay", type=float, default=0.002, help="epsilon = 1 - eps_decay * epoch")
+    parser.add_argument("--update-rate", type=int, default=100)
+    parser.add_argument("--save-rate", type=int, default=100)
+    parser.add_argument("--optimize-times", type=int, default=10)
+    parser.add_argument("--num-workers", type=int, default=1)
+    parser.add_argument("--sync-rate", type=int, default=10)
+    parser.add_argument("--num-envs", type=int, default=1, help="worlds played at once per actor/epoch")
+    parser.add_argument("--prioritized", action="store_true")
+    parser.add_argument("--burn-in", type=int, default=0)
+    parser.add_argument("--unroll", type=int, default=None)
+    parser.add_argument("--map-pool", default=None, help="directory of pre-generated maps per level")
+    parser.add_argument("--pool-size", type=int, default=10000, help="maps per level in the pool")
+    parser.add_argument("--log-every", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        torch.manual_seed(args.seed)
+
+    config = Config(
+        device=torch.device(args.device),
+        n_states=13,
+        n_actions=6,
+        rm_size=args.rm_size,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        update_rate=args.update_rate,
+        lr=args.lr,
+        gamma=args.gamma,
+        epsilon=partial(linear_epsilon, decay=args.eps_decay),
+        epsilon_decay_begin=0,
+        epsilon_decay_end=int(1 / args.eps_decay) if args.eps_decay else 0,
+        save_rate=args.save_rate,
+        optimize_rate=1,
+        num_workers=args.num_workers,
+        optimize_times=args.optimize_times,
+        rm_rows=args.rm_rows,
+        prioritized=args.prioritized,
+        burn_in=args.burn_in,
+        unroll=args.unroll,
+        sync_rate=args.sync_rate,
+        num_envs=args.num_envs
+    )
+
+    maps = MapPool(args.map_pool, levels, args.pool_size) if args.map_pool else None
+
+    agent = DRQN_Agent(DRQN, config, path=args.load)
+    train(agent, config, save_path=args.save, log_every=args.log_every, maps=maps, checkpoint=args.checkpoint)
+
+
+if __name__ == "__main__":
+    main()
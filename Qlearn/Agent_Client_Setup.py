@@ -47,8 +47,11 @@ sttSUBfsm = SubStt.RES  # inicia o status da subFSM como SubStt.RES
 # a var 'd' indica quantidade de casas no grid, a partir da posição atual.
 InfoReqSeq = [["fwd", 0], ["fwd", 1], ["r90", 1], ["l90", 1]]
 nofInfoRequest = len(InfoReqSeq)  # Número de requests que o agente faz p/ o EnviSim antes de decidir
-# a cada request, o programa salvará em um array (com nofInfoRequest elementos x 32 bits)
-CurrentSensBits = np.zeros((nofInfoRequest, 32), dtype=np.int32)  # array c/ nofInfoRequest vals de 32 bits
+# quantos requests podem ficar sem resposta ao mesmo tempo: 1 = um por vez (espera cada resposta),
+# nofInfoRequest = envia todos de uma vez e casa as respostas na ordem (uma ida e volta por decisão)
+maxInFlight = 1
+# a cada request, o programa salvará em um array (com nofInfoRequest máscaras de 32 bits)
+CurrentSensBits = np.zeros(nofInfoRequest, dtype=np.uint32)  # array c/ nofInfoRequest máscaras uint32
 # print('reqInfo:', InfoReqSeq)
 # print('CurrentSensBits: ', CurrentSensBits)
 # --- sys.exit(0)
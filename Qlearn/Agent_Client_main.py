@@ -1,284 +1,379 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import argparse
+import asyncio
+import json
+import signal
 import socket
-import time
-import keyboard as kb
+from collections import deque
 
 # ------------------------ setup -----------------------------
 from Agent_Client_Cognition import *  # importa todos os métodos/funções de Cognition
 
 # Nota: todas as definições de vars e inicializações estão no arquivo 'Agent_Client_Setup.py'
-from Agent_Client_Setup import Stt, SubStt, InfoReqSeq, sttMM, sttSUBfsm, msg, answES, \
-    energy, carryRWD, iterNum, strCode, InpSensors, idxInpSensor, nofInfoRequest, cntNofReqs,\
-    delaySec, keyMagREQ, REQfwd, REQrst, keyMwpPOS, OUTdie, OUTrst, OUTsuc, posX, posY
+from Agent_Client_Setup import Stt, SubStt, InfoReqSeq, energy, InpSensors, nofInfoRequest, maxInFlight, delaySec, \
+    REQfwd, REQlft, REQl45, REQrst, REQrgt, REQr45, keyMwpPOS, OUTdie, OUTrst, OUTsuc
 # ---(end)---------------- setup -----------------------------
 
-# ------ MAIN = here starts the main program  ------
-
-# 1. estabelecendo a conexão de IPC 'Comunicação entre Processos' com o processo EnviSim
-host_name = socket.gethostname()  # obter o nome deste computador
-host_IP = socket.gethostbyname(host_name)  # obter o endereço IP deste computador (intranet)
 IPC_port = 15051  # número do PORT (use o mesmo número de PORTA no programa EnviSim)
-sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # criar um socket = sock
-server_address = (host_IP, IPC_port)  # a variável endereço_servidor contém: o IP + porta_IPC
-# apenas para teste: imprimir a variável endereço_servidor
-# print('server: {} - port: {}'.format(host_IP,IPC_port))
-# print('server: {}'.format(server_address))
-
-# 2. loop até que a tecla 'esc' seja pressionada (ESC termina este processo)!
-
-while msg != 'esc':
-
-    if kb.is_pressed('esc'):  # se a tecla 'Escape' for pressionada
-        msg = 'esc'  # muda a variável msg para 'esc' e força a saída do loop while
-        break
 
-    # se o estado principal da FSM = 'BEGIN', crie um socket e tente se conectar ao EnviSim
-    while sttMM == Stt.BEGIN:
-        # print('<< begin >>')
-        reward = 0
-        try:
-            sock.connect(server_address)  # tenta conetar com o servidor na porta definida
-            print('Conectado ao Servidor: %s >> porta: %s' % server_address)
-            sttMM = Stt.RECEIVING  # depois de conectar, mude a FSM para o estado RECEIVING
-        except socket.timeout:  # exceção - tempo esgotado
-            # print('ERRO: tempo limite do socket')
-            strCode = 'tempo_limite_socket'
-            sttMM = Stt.ERRORS  # colocar a máquina no estado ERROS
-        except socket.error as e:  # exceção - erro ao se conectar ao servidor
-            # print('ERRO ao se conectar ao servidor: %s' % e)
-            strCode = 'conexao_servidor'
-            sttMM = Stt.ERRORS  # colocar a máquina no estado ERROS
-        break
-
-    # se o estado da FSM principal for 'RESTARTING', este programa envia uma solicitação de reinício (RESTARTING) para o EnviSim
-    while sttMM == Stt.RESTARTING:
-        reward = 0
+msgRST = create_msg(OutNeurons.index('out_req_' + REQrst), 0)  # {"request":["restart",0]}
+msgFWD = create_msg(OutNeurons.index('out_req_' + REQfwd), 1)  # {"request":["forward",1]}
+
+
+class Session:
+    '''
+    Uma conversa com o EnviSim: a FSM principal (Stt) e a subFSM (SubStt), com o
+    estado guardado na sessão. Cada estado da FSM principal é uma corrotina que
+    devolve o próximo estado; só RECEIVING e SENDING esperam pela rede
+    (asyncio.StreamReader/StreamWriter), então um processo pode conduzir várias
+    sessões ao mesmo tempo. As decisões vêm da 'mente' da sessão (Cognition.Mind).
+    '''
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, mind: Mind):
+        self.reader = reader
+        self.writer = writer
+        self.mind = mind
+
+        self.sttSUBfsm = SubStt.RES  # inicia o status da subFSM como SubStt.RES
+        self.msg = []  # mensagens (bytes prontos, Cognition.create_msg) que serão enviadas juntas para o EnviSim
+        self.answES = {}  # resposta recebida do EnviSim (objeto Json)
+        self.answers = AnswerStream()  # respostas já recebidas e ainda não interpretadas (requests em voo)
+        self.strCode = ''  # código para exceções, erros, etc.
+        self.idxInpSensor = 0  # índice do sensor de entrada ativado
+        self.CurrentSensBits = 0  # máscara dos sensores da última resposta (bit i = InpSensors[i])
+        self.sensInpBits = np.zeros(nofInfoRequest, dtype=np.uint32)  # uma máscara de sensores por request
+        self.cntNofReqs = 0  # número de solicitações já respondidas
+        self.cntSent = 0  # número de solicitações já enviadas (até maxInFlight à frente das respondidas)
+        self.iterNum = 0  # número de iterações executadas até agora
+        self.carryRWD = 0  # se o agente carrega a recompensa
+        self.reward = 0
+        self.exit_code = 0
+
+        self.states = {
+            Stt.RESTARTING: self.restarting,
+            Stt.INTERPRETING: self.interpreting,
+            Stt.DECIDING: self.deciding,
+            Stt.EXCEPTIONS: self.exceptions,
+            Stt.RECEIVING: self.receiving,
+            Stt.SENDING: self.sending,
+        }
+
+    async def run(self, sttMM=Stt.RECEIVING):
+        # roda a FSM até ERRORS ou uma exceção não tratada; devolve o código de saída
+        while sttMM in self.states:
+            sttMM = await self.states[sttMM]()
+
+        if sttMM == Stt.ERRORS:
+            print('--> estado ERRORS::')
+            print(self.strCode)
+            self.exit_code = -1
+        return self.exit_code
+
+    # envia uma solicitação de reinício (RESTARTING) para o EnviSim
+    async def restarting(self):
+        self.reward = 0
         print('<< restarting >>')
-        msg = '{\"' + keyMagREQ + '\":[\"' + REQrst + '\",0]}'  # solicita ao EnviSim que reinicie a missão
-        sttSUBfsm = SubStt.RES  # após o reinício, coloque sempre o subFSM no estado BEGIN
-        sttMM = Stt.SENDING  # envia esta mensagem para o EnviSim
-        break
-
-    # quando a FSM vai para o estado 'INTERPRETING', o programa deve analisar a mensagem Json recebida
-    # aqui convertemos a mensagem do EnviSim em 'spikes' nos neurônios de entrada do SNN
-    while sttMM == Stt.INTERPRETING:
-        # print('<< interpreting >>')
-        # chama o método que interpreta a mensagem
-        # ele retorna um novo estado da FSM principal, um código de str (ou ''), e o idx do sensor detectado
-        sttMM, strCode, idxInpSensor, CurrentSensBits, r = interpreting(answES)
-        reward += r
-        print("reward", reward)
-        # print('veio:', CurrentSensBits)
-    # O FSM entra no estado DECIDING após ter recebido e interpretado uma mensagem
-    # Aqui, a "mente" do agente toma decisões e gera: comando/ação/requisição
-
-    while sttMM == Stt.DECIDING:
-        print('<< decidindo >> ', (energy - iterNum))
-
-        if iterNum >= energy:  # teste: 'jogo acabou'? O agente não completou a missão
-            print('O agente não tem mais ENERGIA!')  # se o jogo acabar, imprime essa mensagem
-            strCode = 'noEnergy'  # o agente não tem mais energia - MORREU...
-            sttMM = Stt.EXCEPTIONS  # muda o estado para EXCEPTIONS
-            break
-        else:
-            iterNum = iterNum + 1 # contagem do número de iterações
-
-        # ATENÇÃO: isso está dentro da MAIN STATE-MACHINE, mas é uma FSM secundária
-        # esta sub-FSM controla quantas vezes o agente solicita informações do EnviSim
-        while sttSUBfsm == SubStt.RES:  # após reiniciar a cena, a subFSM sempre começa a solicitar dados
-            if InpSensors[idxInpSensor] == 'inp_' + OUTrst:  # se retornar 'inp_restarted'
-                iterNum = 0  # redefinir o número de iterações (energia resetada)
-                sttSUBfsm = SubStt.START  # muda o estado desta subFSM para 'solicitar' informações do EnviSim
-            else:
-                strCode = 'erro => esperava reiniciado...'  # erro não reiniciado
-                sttMM = Stt.ERRORS  # muda o estado do FSM principal para EXCEPTIONS
-            break
-
-        while sttSUBfsm == SubStt.START:  # for START requesting information only
-            cntNofReqs = 0  # set counter of input requirements to 0
-            sensInpBits = np.zeros((nofInfoRequest, 32), dtype=np.int32)  # array with nofInfoRequestx32 bits
-            sttSUBfsm = SubStt.ASK  # change the state of this subFSM to 'ASK for' info from EnviSim
-            break
-
-        while sttSUBfsm == SubStt.ASK:  # permanece no estado ASK enquanto solicita informações
-            if cntNofReqs < nofInfoRequest:
-                d = str(InfoReqSeq[cntNofReqs][1])  # distância da posição atual que o agente deseja informações
-                msg = '{\"' + keyMagREQ + '\":[\"'  # inicia a string de mensagem de solicitação (igual para todas as solicitações)
-                if InfoReqSeq[cntNofReqs][0] == 'fwd':  # está solicitando informações de avanço?
-                    msg = msg + REQfwd + '\",' + d + ']}'  # completa a string de mensagem de solicitação para avançar
-                elif InfoReqSeq[cntNofReqs][0] == 'r90':  # está solicitando informações de 90 graus à direita?
-                    msg = msg + REQrgt + '\",' + d + ']}'  # completa a string de mensagem de solicitação para a direita
-                elif InfoReqSeq[cntNofReqs][0] == 'l90':  # está solicitando informações de 90 graus à esquerda?
-                    msg = msg + REQlft + '\",' + d + ']}'  # completa a string de mensagem de solicitação para a esquerda
-                elif InfoReqSeq[cntNofReqs][0] == 'r45':  # está solicitando informações de 45 graus à direita?
-                    msg = msg + REQr45 + '\",' + d + ']}'  # completa a string de mensagem de solicitação para a direita
-                elif InfoReqSeq[cntNofReqs][0] == 'l45':  # está solicitando informações de 45 graus à esquerda?
-                    msg = msg + REQl45 + '\",' + d + ']}'  # completa a string de mensagem de solicitação para a esquerda
-                sttMM = Stt.SENDING  # altera o estado para enviar a mensagem
-                sttSUBfsm = SubStt.WAITRQ  # altera para o estado WAITRQ (aguardar respostas ao solicitar)
-                break
-            break
-
-        while sttSUBfsm == SubStt.SAVE:  # estado de SALVAR apenas para salvar a resposta do pedido anterior
-            sensInpBits[cntNofReqs] = CurrentSensBits  # salvar as respostas nesta matriz
-            cntNofReqs = cntNofReqs + 1  # incrementar o contador (quantos pedidos foram feitos)
-            if cntNofReqs == nofInfoRequest:
-                sttSUBfsm = SubStt.CMD  # alterar o estado do subFSM para 'enviar' comandos para EnviSim
-            else:
-                sttSUBfsm = SubStt.ASK  # mudar novamente para o estado ASK até que todos os pedidos sejam feitos
-            # print('saving: ', sensInpBits)
-            break
-
-        while sttSUBfsm == SubStt.CMD:  # depois de adquirir info, tomar uma decisão e enviar COMANDO p/ EnviSim
-            cntNofReqs = 0  # faz cntNofReqs = zero p/ prox interação com EnviSim
-            print("pre infer reward", reward)
-            decision = infer(sensInpBits, reward)  # fazer uma inferência (escolher uma ação/saída para ser disparada)
-            reward = 0
-            msg = create_msg(decision, 1)  # converte a decision em uma mensagem p/ EnviSim
-            sttMM = Stt.SENDING  # muda o estado da FSM principal p/ SENDING
-            sttSUBfsm = SubStt.WAITCM  # muda o sub-estado da subFSM p/ WAITCM (wait for answers after a command)
-            break
-
-        while sttSUBfsm == SubStt.CNT:
-            fdbkcode = feedback_analysis(sensInpBits, carryRWD)  # faz uma inferência (o que foi recebido como feedback)
-            if fdbkcode == -1:
-                strCode = 'erro => reiniciando...'  # erro não reiniciável
-                sttMM = Stt.ERRORS  # muda o estado da máquina principal para EXCEPTIONS
-            elif fdbkcode == 50:  # código para quando o agente pega o ouro
-                print('-> a RECOMPENSA foi coletada <-')  # o agente completou a missão com sucesso
-                carryRWD = 1
-                iterNum = 0  # restaura a energia do agente
-                got_gold()
-            elif fdbkcode == 100:  # código para sucesso!
-                print('O Agente GANHOU - sucesso!')  # o agente completou a missão com sucesso
-                strCode = OUTsuc  # string para sucesso
-                sttMM = Stt.EXCEPTIONS  # muda o estado para EXCEPTIONS
-                sttSUBfsm = SubStt.ASK  # muda para o estado ASK
-                break
-            elif fdbkcode == -100:  # código para morte!
-                print('O Agente MORREU ')  # o agente morreu
-                strCode = OUTdie  # string para morte
-                sttMM = Stt.EXCEPTIONS  # muda o estado para EXCEPTIONS
-                sttSUBfsm = SubStt.ASK  # muda para o estado ASK
-                break
-            msg = create_msg(fdbkcode, 0)  # transforma o feedback em uma mensagem
-            sttMM = Stt.SENDING  # muda o estado da máquina para SENDING
-            sttSUBfsm = SubStt.ASK  # muda para o estado ASK
-            break
-
-        while sttSUBfsm == SubStt.WAITRQ:
-            sttSUBfsm = SubStt.SAVE  # mudar para o estado SAVE para salvar as respostas
-            break
-
-        while sttSUBfsm == SubStt.WAITCM:
-            # este atraso é apenas para efeitos visuais - remova-o para simulações mais rápidas
-            if delaySec > 0:
-                time.sleep(delaySec)  # pausar a execução por dt segundos
-            sttSUBfsm = SubStt.CNT  # mudar para o estado CNT
-            break
-
-
-    # quando a FSM está no estado EXCEPTIONS, um comando/mensagem EnviSim para este programa foi recebido
-    # hierarquicamente, essas mensagens são mais importantes do que as 'SENSE'
-    # eles são: não pode, morreu, pegou, nenhum, sucesso (eles significam o resultado de uma ação)
-    # você deve decidir: o que fazer quando o agente morrer? ou pegar o ouro? ou ter sucesso? etc.
-    # deveria 'SALVAR' uma missão? deveria simplesmente 'REINICIAR' EnviSim? (é aberto)
-    while sttMM == Stt.EXCEPTIONS:
-        # print('EXCEPTION - dealing with a special msg')  # apenas imprime uma nota para esta situação
-
-        if strCode == OUTrst:  # recebeu 'restarted' - primeira coisa a fazer: pedir informações
-            msg = '{\"' + keyMagREQ + '\":[\"' + REQfwd + '\",1]}'  # solicita informações sobre 1 posição à frente
-            sttMM = Stt.SENDING  # muda o estado da máquina para SENDING
-            break
-
-        elif strCode == keyMwpPOS:  # trate o que você fará com posX e posY
-            posX = posX  # o valor atual de x - você irá salvá-lo?
-            posY = posY  # o valor atual de y - você irá salvá-lo?
-            msg = '{\"' + keyMagREQ + '\":[\"' + REQfwd + '\",1]}'  # solicita informações ???
-            sttMM = Stt.SENDING  # muda o estado da máquina para SENDING
-            break
-
-        elif strCode == 'noEnergy':  # trate o caso quando o agente morreu sem energia
+        self.msg = [msgRST]  # solicita ao EnviSim que reinicie a missão
+        self.sttSUBfsm = SubStt.RES  # após o reinício, coloque sempre o subFSM no estado BEGIN
+        return Stt.SENDING
+
+    # converte a mensagem Json recebida do EnviSim em 'spikes' nos neurônios de entrada
+    async def interpreting(self):
+        sttMM, self.strCode, self.idxInpSensor, self.CurrentSensBits, r = interpreting(self.answES, self.mind)
+        self.reward += r
+        print("reward", self.reward)
+        return sttMM
+
+    # a "mente" do agente toma decisões e gera: comando/ação/requisição
+    # os estados da subFSM são testados em sequência, uma passada por iteração, até sair de DECIDING
+    async def deciding(self):
+        while True:
+            print('<< decidindo >> ', (energy - self.iterNum))
+
+            if self.iterNum >= energy:  # teste: 'jogo acabou'? O agente não completou a missão
+                print('O agente não tem mais ENERGIA!')
+                self.strCode = 'noEnergy'  # o agente não tem mais energia - MORREU...
+                return Stt.EXCEPTIONS
+            self.iterNum = self.iterNum + 1  # contagem do número de iterações
+            sttMM = Stt.DECIDING
+
+            if self.sttSUBfsm == SubStt.RES:  # após reiniciar a cena, a subFSM sempre começa a solicitar dados
+                if InpSensors[self.idxInpSensor] == 'inp_' + OUTrst:  # se retornar 'inp_restarted'
+                    self.iterNum = 0  # redefinir o número de iterações (energia resetada)
+                    self.sttSUBfsm = SubStt.START
+                else:
+                    self.strCode = 'erro => esperava reiniciado...'  # erro não reiniciado
+                    return Stt.ERRORS
+
+            if self.sttSUBfsm == SubStt.START:  # for START requesting information only
+                self.cntNofReqs = 0
+                self.cntSent = 0
+                self.sensInpBits = np.zeros(nofInfoRequest, dtype=np.uint32)
+                self.sttSUBfsm = SubStt.ASK
+
+            if self.sttSUBfsm == SubStt.ASK:  # permanece no estado ASK enquanto solicita informações
+                if self.cntNofReqs < nofInfoRequest:
+                    if self.cntSent - self.cntNofReqs < maxInFlight and self.cntSent < nofInfoRequest:
+                        # completa a janela: os requests seguintes vão juntos, sem esperar as respostas
+                        top = min(self.cntNofReqs + maxInFlight, nofInfoRequest)
+                        self.msg = request_msgs[self.cntSent:top]
+                        self.cntSent = top
+                        sttMM = Stt.SENDING  # altera o estado para enviar a mensagem
+                    else:
+                        sttMM = Stt.RECEIVING  # a resposta do próximo request já está a caminho
+                    self.sttSUBfsm = SubStt.WAITRQ  # aguardar respostas ao solicitar
+
+            if self.sttSUBfsm == SubStt.SAVE:  # salva a resposta do pedido anterior
+                self.sensInpBits[self.cntNofReqs] = self.CurrentSensBits
+                self.cntNofReqs = self.cntNofReqs + 1
+                if self.cntNofReqs == nofInfoRequest:
+                    self.sttSUBfsm = SubStt.CMD  # 'enviar' comandos para EnviSim
+                else:
+                    self.sttSUBfsm = SubStt.ASK  # volta ao ASK até que todos os pedidos sejam feitos
+
+            if self.sttSUBfsm == SubStt.CMD:  # depois de adquirir info, tomar uma decisão e enviar COMANDO
+                self.cntNofReqs = 0
+                self.cntSent = 0
+                print("pre infer reward", self.reward)
+                if self.mind.link.blocking:  # espera pelo processo de Q-learning: roda fora do loop de eventos
+                    decision = await asyncio.to_thread(self.mind.infer, self.sensInpBits, self.reward)
+                else:
+                    decision = self.mind.infer(self.sensInpBits, self.reward)
+                self.reward = 0
+                self.msg = [create_msg(decision, 1)]  # converte a decision em uma mensagem p/ EnviSim
+                sttMM = Stt.SENDING
+                self.sttSUBfsm = SubStt.WAITCM  # aguardar a resposta do comando
+
+            if self.sttSUBfsm == SubStt.CNT:
+                fdbkcode = feedback_analysis(self.sensInpBits, self.carryRWD)  # o que foi recebido como feedback
+                if fdbkcode == -1:
+                    self.strCode = 'erro => reiniciando...'  # erro não reiniciável
+                elif fdbkcode == 50:  # código para quando o agente pega o ouro
+                    print('-> a RECOMPENSA foi coletada <-')
+                    self.carryRWD = 1
+                    self.iterNum = 0  # restaura a energia do agente
+                    self.mind.got_gold()
+                elif fdbkcode == 100:  # código para sucesso!
+                    print('O Agente GANHOU - sucesso!')
+                    self.strCode = OUTsuc
+                    self.sttSUBfsm = SubStt.ASK
+                    return Stt.EXCEPTIONS
+                elif fdbkcode == -100:  # código para morte!
+                    print('O Agente MORREU ')
+                    self.strCode = OUTdie
+                    self.sttSUBfsm = SubStt.ASK
+                    return Stt.EXCEPTIONS
+                self.msg = [create_msg(fdbkcode, 0)]  # transforma o feedback em uma mensagem
+                sttMM = Stt.SENDING
+                self.sttSUBfsm = SubStt.ASK
+
+            if self.sttSUBfsm == SubStt.WAITRQ:
+                self.sttSUBfsm = SubStt.SAVE  # salvar as respostas quando chegarem
+
+            if self.sttSUBfsm == SubStt.WAITCM:
+                # este atraso é apenas para efeitos visuais - remova-o para simulações mais rápidas
+                if delaySec > 0:
+                    await asyncio.sleep(delaySec)
+                self.sttSUBfsm = SubStt.CNT
+
+            if sttMM != Stt.DECIDING:
+                return sttMM
+
+    # resultado de uma ação que interessa mais do que as 'SENSE': morreu, sucesso, sem energia...
+    async def exceptions(self):
+        if self.strCode == OUTrst:  # recebeu 'restarted' - primeira coisa a fazer: pedir informações
+            self.msg = [msgFWD]
+            return Stt.SENDING
+
+        elif self.strCode == keyMwpPOS:  # trate o que você fará com posX e posY
+            self.msg = [msgFWD]  # solicita informações ???
+            return Stt.SENDING
+
+        elif self.strCode == 'noEnergy':  # trate o caso quando o agente morreu sem energia
             print("no energy reset")
-            # você irá salvar a missão atual?
-            msg = '{\"' + keyMagREQ + '\":[\"' + REQrst + '\",0]}'  # solicita um reset imediato ???
-            iterNum = 0  # reinicia o valor para o número de iterações
-            sttMM = Stt.SENDING  # muda o estado da máquina para SENDING
-            break
-
-        elif strCode == OUTdie:  # trate o caso quando o agente morreu!!!
-            # você irá salvar a missão atual?
-            msg = '{\"' + keyMagREQ + '\":[\"' + REQrst + '\",0]}'  # solicita que EnviSim reinicie a missão
-            iterNum = 0  # reinicia o valor para o número de iterações
-            sttMM = Stt.SENDING  # muda o estado da máquina para SENDING
-            break
-
-        elif strCode == OUTsuc:  # Ótimo!!! Parece que o agente alcançou com sucesso o final da missão
-            msg = '{\"' + keyMagREQ + '\":[\"' + REQrst + '\",0]}'  # solicita um reset imediato ???
-            iterNum = 0  # reinicia o valor para o número de iterações
-            carryRWD = 0  # restaura a condição de não ter recebido a recompensa
-
-            # o que fazer com a missão atual?
-
-            sttMM = Stt.SENDING  # altera o estado da máquina para SENDING
-            break
-        sys.exit(-2)
-
-    # este é um estado para testes, que pode ser excluído na versão final deste programa
-    while sttMM == Stt.ERRORS:
-        print('--> estado ERRORS::')
-        print(strCode)
-        sys.exit(-1)
-        # você pode colocar aqui qualquer tipo de código para tratar erros
-
-    # se o estado principal da FSM for 'RECEIVING', aguarda uma resposta do EnviSim
-    while sttMM == Stt.RECEIVING:
-        # print('<< receiving >>')
-        try:
-            answES = sock.recv(256)  # recebe uma mensagem com até 256 caracteres
-            print('resposta_conn: %s' % answES)
-            sttMM = Stt.INTERPRETING  # resposta recebida, altera o estado para INTERPRETING
-        except socket.error as e:  # se ocorrer algum erro, imprime o erro do socket
-            print('Erro de Socket: ', str(e))
-            strCode = 'socket_error'
-            sttMM = Stt.ERRORS  # coloca a máquina no estado ERRORS
-        break
-
-    # se o estado da FSM for 'SENDING', este programa envia o conteúdo da variável 'msg' para o EnviSim
-    while sttMM == Stt.SENDING:
-        # print('<< sending >>')
-        print('enviando = ', msg)
-        if msg != '':  # testa se a variável 'msg' não está vazia
+            self.msg = [msgRST]  # solicita um reset imediato
+            self.iterNum = 0
+            return Stt.SENDING
+
+        elif self.strCode == OUTdie:  # trate o caso quando o agente morreu!!!
+            self.msg = [msgRST]  # solicita que EnviSim reinicie a missão
+            self.iterNum = 0
+            return Stt.SENDING
+
+        elif self.strCode == OUTsuc:  # o agente alcançou com sucesso o final da missão
+            self.msg = [msgRST]  # solicita um reset imediato
+            self.iterNum = 0
+            self.carryRWD = 0  # restaura a condição de não ter recebido a recompensa
+            return Stt.SENDING
+
+        self.exit_code = -2  # exceção não tratada: encerra a sessão
+        return None
+
+    # aguarda uma resposta do EnviSim (uma leitura pode trazer várias, ou só parte de uma)
+    async def receiving(self):
+        while not self.answers:
             try:
-                sock.sendall(msg.encode('utf-8'))  # envia a mensagem via socket
-                # print('sent: ', msg)  # imprime a mensagem enviada para o EnviSim
-                msg = ''  # limpa a string na variável 'msg'
-                sttMM = Stt.RECEIVING  # altera a FSM para o estado RECEIVING
-            except socket.error as e:  # se ocorrer algum erro, imprime o erro do socket
+                data = await self.reader.read(256)  # recebe uma mensagem com até 256 caracteres
+            except OSError as e:
                 print('Erro de Socket: ', str(e))
-                strCode = 'socket_error'
-                sttMM = Stt.ERRORS  # coloca a máquina no estado ERRORS
-            break
-        else:  # erro - tentando enviar uma mensagem vazia
+                self.strCode = 'socket_error'
+                return Stt.ERRORS
+            if not data:  # o EnviSim fechou a conexão
+                self.strCode = 'socket_error'
+                return Stt.ERRORS
+            self.answers.feed(data)
+        self.answES = self.answers.pop()
+        print('resposta_conn: %s' % self.answES)
+        return Stt.INTERPRETING
+
+    # envia o conteúdo de 'msg' para o EnviSim, todas as mensagens numa escrita só (writelines)
+    async def sending(self):
+        print('enviando = ', self.msg)
+        if not self.msg:  # erro - tentando enviar uma mensagem vazia
             print('Atenção: tentando enviar uma mensagem vazia')
-            strCode = 'empty_msg'
-            sttMM = Stt.ERRORS  # altera para o estado que trata os ERROS
-            break
-
-    # estado para testes - pode ser deletado no final...
-    while sttMM == Stt.FOR_TESTS:
-        print('>> state FOR_TESTS <<')
-
-        # coloque aqui qualquer código que vc queira testar...
-        break
-
-
-else:  # se msg == 'esc' esse processo (programa) será fechado
-    sock.close()  # close the socket
+            self.strCode = 'empty_msg'
+            return Stt.ERRORS
+        try:
+            self.writer.writelines(self.msg)
+            await self.writer.drain()
+        except OSError as e:
+            print('Erro de Socket: ', str(e))
+            self.strCode = 'socket_error'
+            return Stt.ERRORS
+        self.msg = []
+        return Stt.RECEIVING
+
+
+class AnswerStream:
+    '''
+    Separa os bytes que chegam do EnviSim em mensagens Json completas. As leituras
+    se acumulam num bytearray; a varredura das chaves ({ }) continua de onde parou,
+    então uma mensagem cortada entre duas leituras espera pelo resto e várias
+    mensagens coladas numa leitura saem uma a uma, já decodificadas, na ordem.
+    '''
+    def __init__(self):
+        self.buffer = bytearray()
+        self.messages = deque()  # mensagens completas ainda não interpretadas
+        self.scan = 0  # próximo byte a varrer
+        self.depth = 0  # chaves abertas na mensagem atual
+        self.quoted = False  # dentro de uma string Json
+        self.escaped = False  # o byte anterior era '\\' dentro da string
+
+    def __len__(self):
+        return len(self.messages)
+
+    def feed(self, data: bytes):
+        buffer = self.buffer
+        buffer += data
+        begin = 0
+        for i in range(self.scan, len(buffer)):
+            c = buffer[i]
+            if self.quoted:
+                if self.escaped:
+                    self.escaped = False
+                elif c == 0x5C:  # \
+                    self.escaped = True
+                elif c == 0x22:  # "
+                    self.quoted = False
+            elif c == 0x22:
+                self.quoted = True
+            elif c == 0x7B:  # {
+                if not self.depth:
+                    begin = i
+                self.depth += 1
+            elif c == 0x7D and self.depth:  # }
+                self.depth -= 1
+                if not self.depth:
+                    self.messages.append(json.loads(buffer[begin:i + 1]))
+                    begin = i + 1
+
+        if not self.depth:
+            begin = len(buffer)  # só sobra espaço entre mensagens
+        del buffer[:begin]
+        self.scan = len(buffer)
+
+    def pop(self) -> dict:
+        return self.messages.popleft()
+
+
+def request_msg(direction: str, dist: int) -> bytes:
+    # mensagem de solicitação de um item de InfoReqSeq, e.g. ["fwd", 1]
+    req = {'fwd': REQfwd, 'r90': REQrgt, 'l90': REQlft, 'r45': REQr45, 'l45': REQl45}[direction]
+    return create_msg(OutNeurons.index('out_req_' + req), dist)
+
+
+request_msgs = [request_msg(*req) for req in InfoReqSeq]  # os requests de cada decisão, na ordem
+
+
+async def run_session(address, mind):
+    # estado BEGIN: conecta ao EnviSim e roda a FSM até o fim da sessão
+    try:
+        reader, writer = await asyncio.open_connection(*address)
+    except OSError as e:
+        print('ERRO ao se conectar ao servidor: %s' % e)
+        return -1
+    print('Conectado ao Servidor: %s >> porta: %s' % address)
+
+    try:
+        return await Session(reader, writer, mind).run()
+    finally:
+        writer.close()
+
+
+async def main(addresses, minds):
+    # uma sessão por endereço (cada uma com sua mente), até todas terminarem ou chegar SIGINT/SIGTERM
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, AttributeError, ValueError):
+            pass  # loop sem sinais (Windows): Ctrl+C chega como KeyboardInterrupt
+
+    sessions = [asyncio.create_task(run_session(address, mind)) for address, mind in zip(addresses, minds)]
+    finished = asyncio.ensure_future(asyncio.gather(*sessions, return_exceptions=True))
+    stopping = asyncio.create_task(stop.wait())
+    await asyncio.wait([finished, stopping], return_when=asyncio.FIRST_COMPLETED)
+
+    stopping.cancel()
+    for session in sessions:
+        session.cancel()
+    codes = await finished
     print('<< END of process >>')  # imprime a mensagem de finalização do processo
-
-sys.exit(0)
+    return min([code for code in codes if isinstance(code, int)], default=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agente do EnviSim: uma sessão por porta.")
+    parser.add_argument("--host", default=None, help="endereço do EnviSim (padrão: o IP deste computador)")
+    parser.add_argument("--ports", type=int, nargs="+", default=[IPC_port],
+                        help="uma sessão por porta (repita a porta para várias sessões no mesmo EnviSim)")
+    parser.add_argument("--local", action="store_true",
+                        help="aprende neste processo (uma Q-table para todas as sessões) em vez do q_learning.py")
+    parser.add_argument("--qtable", default=None, help="Q-table inicial (.npy) no modo local")
+    parser.add_argument("--record", default=None, help="grava as transições do modo local neste arquivo")
+    parser.add_argument("--store", choices=["dense", "hashed"], default="dense",
+                        help="onde ficam os Q-valores no modo local (qstore): tabela densa ou só os estados visitados")
+    args = parser.parse_args()
+
+    # 1. estabelecendo a conexão de IPC 'Comunicação entre Processos' com o processo EnviSim
+    host_IP = args.host or socket.gethostbyname(socket.gethostname())  # endereço IP deste computador (intranet)
+    addresses = [(host_IP, port) for port in args.ports]
+
+    if args.local or len(addresses) > 1:
+        # modo host: K sessões alimentam o mesmo QLearner (o q_learning.py não é usado)
+        import q_learning
+        from q_learning import QLearner, LocalLink, TransitionLog
+        q_learning.STORE = args.store
+        learner = QLearner(np.load(args.qtable) if args.qtable else None,
+                           TransitionLog(args.record) if args.record else None)
+        minds = [Mind(LocalLink(learner)) for _ in addresses]
+    else:
+        learner = None
+        minds = [Mind(LearnerLink())]  # espera o q_learning.py se conectar
+    code = asyncio.run(main(addresses, minds))
+    if learner is not None:
+        learner.close()
+    sys.exit(code)
 # ----(end)----- MAIN = end of main program  --------
-
@@ -0,0 +1,59 @@
+import struct
+
+'''
+Framed messages of the Cognition (Agent_Client_Cognition) <-> Q-learning (Receiver)
+link. A frame is a 3 byte header, payload length (uint16) and kind (one ascii
+byte), followed by a fixed layout payload:
+    s  state: 5 x uint8 (current cell, front, left, right senses, has_gold)
+    r  reward of the last state: int16
+    e  end of the episode, final reward: int16
+    a  action index, Receiver -> Cognition: uint8
+Frames are self-delimiting, so they can be sent back to back (the state and its
+reward go out in one sendall) and need no acknowledgement.
+'''
+
+TRANSPORT = "tcp"  # "shm" for same-host runs (shm_link), both sides read it from here
+
+HEADER = struct.Struct("<HB")
+payloads = {'s': "5B", 'r': "h", 'e': "h", 'a': "B"}
+frames = {ord(kind): struct.Struct("<HB" + layout) for kind, layout in payloads.items()}
+
+
+def pack(kind, *values):
+    frame = frames[ord(kind)]
+    return frame.pack(frame.size - HEADER.size, ord(kind), *values)
+
+
+class FrameReader:
+    '''
+    Reads frames from a socket into one reusable buffer (recv_into) and parses
+    them in place with unpack_from. read() returns (kind, values).
+    '''
+    def __init__(self, sock, size=4096):
+        self.sock = sock
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.begin = 0  # first unread byte
+        self.end = 0  # end of the received bytes
+
+    def fill(self, n):
+        # makes sure there are n unread bytes in the buffer
+        if self.begin + n > len(self.buffer):
+            self.view[:self.end - self.begin] = self.buffer[self.begin:self.end]
+            self.end -= self.begin
+            self.begin = 0
+        while self.end - self.begin < n:
+            received = self.sock.recv_into(self.view[self.end:])
+            if not received:
+                raise ConnectionError("link closed")
+            self.end += received
+
+    def read(self):
+        self.fill(HEADER.size)
+        length, kind = HEADER.unpack_from(self.buffer, self.begin)
+        self.fill(HEADER.size + length)
+        values = frames[kind].unpack_from(self.buffer, self.begin)[2:]
+        self.begin += HEADER.size + length
+        if self.begin == self.end:
+            self.begin = self.end = 0
+        return chr(kind), values
@@ -1,21 +1,18 @@
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
-from receiver import Receiver
-import time
+
+from qstore import DenseStore, HashedStore, load_store
+from snapshots import SnapshotStore
 
 # Setup: Qtable and env
 
 low, high = -1, 0# parameters
 
-env = Receiver()  # the enviroment object
-env.start()
-
 n_states = [3, 8, 8, 8, 2]
 n_actions = 6
 actions = range(6)
-
-Q_table = np.random.uniform(low=low, high=high, size=(n_states + [n_actions]))
-#Q_table = np.load("qtables/50-qtable.npy")
+STORE = "dense"  # where the Q-values live (qstore): "dense" table or "hashed", only the visited states
 
 # Parameters
 ALPHA: float = 0.5
@@ -26,82 +23,352 @@ EXPLORATION_END: int = 1000  # EPISODES//5
 
 LOG_EVERY = 1
 SAVE_EVERY = 50
-log = []
-log_stats = {'ep': [], 'avg': [], 'max': [], 'min': []}
+SNAPSHOT_DTYPE = np.float64  # of the saved tables (snapshots.SnapshotStore), float32/float16 for smaller (lossy) files
+SNAPSHOT_DIR = None  # where this run saves its tables, None: a new qtables/<date-time>
 
-epsilon = .8
-EPSILON_DECAY = epsilon / (EXPLORATION_END - EXPLORATION_BEGIN)
+EPSILON = .8
+EPSILON_DECAY = EPSILON / (EXPLORATION_END - EXPLORATION_BEGIN)
 
-time.sleep(1)
+# one recorded step: the state, the action taken, its reward and what came next
+transition = np.dtype([('state', 'u1', len(n_states)), ('action', 'u1'), ('reward', '<i2'),
+                       ('state_new', 'u1', len(n_states)), ('done', '?')])
 
-env.check_end()
-for episode in range(EPISODES):
-    state, _ = env.observe()  # starts the env
-    print("state", state)
-    done = False
 
-    reward_total = 0
+class TransitionLog:
+    '''
+    Appends transitions to a binary file of fixed size records (the transition
+    dtype, 14 bytes each), buffered in memory and written every `flush_every`.
+    load() maps a log back as a structured array.
+    '''
+    def __init__(self, path, flush_every=4096):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "ab")
+        self.buffer = np.zeros(flush_every, dtype=transition)
+        self.n = 0
 
-    while True:
+    def record(self, state, action, reward, state_new, done):
+        self.buffer[self.n] = (state, action, reward, state_new, done)
+        self.n += 1
+        if self.n == len(self.buffer):
+            self.flush()
 
-        if np.random.random() < epsilon:
-            # Explore: Get action randomly
-            action = np.random.choice(actions)
-        else:
-            # Exploit: Get action from Q_table
-            action = np.argmax(Q_table[state])
+    def extend(self, states, actions, rewards, states_new, done):
+        # a batch of transitions (BatchSimulator agents) goes straight to the file
+        self.flush()
+        batch = np.zeros(len(actions), dtype=transition)
+        batch['state'], batch['action'], batch['reward'] = states, actions, rewards
+        batch['state_new'], batch['done'] = states_new, done
+        batch.tofile(self.file)
 
+    def flush(self):
+        self.buffer[:self.n].tofile(self.file)
+        self.file.flush()
+        self.n = 0
 
-        env.act(action)
-        done, reward = env.check_end()
+    def close(self):
+        self.flush()
+        self.file.close()
 
-        if done:
-            sa = state + (action,)
-            Q_table[sa] = reward
-            reward_total += reward
-            break
+    @staticmethod
+    def load(path):
+        size = os.path.getsize(path)
+        if size % transition.itemsize:
+            raise ValueError(f"{path}: {size} bytes is not a whole number of "
+                             f"{transition.itemsize} byte transitions (a partial record at the end?)")
+        if size == 0:
+            return np.zeros(0, dtype=transition)  # nothing flushed yet, np.memmap cannot map an empty file
+        return np.memmap(path, dtype=transition, mode="r")
 
-        state_new, reward = env.observe()
-        if reward == 50:
-            print(reward)
-        reward_total += reward
+
+def make_store(Q_table=None):
+    # a STORE backend, empty or from a saved table (a dense table or a HashedStore snapshot)
+    if Q_table is not None:
+        return load_store(Q_table, n_states, n_actions, STORE == "hashed", low, high)
+    if STORE == "hashed":
+        return HashedStore(n_states, n_actions, low=low, high=high)
+    return DenseStore(n_states, n_actions, low=low, high=high)
+
+
+def train_offline(Q_table, log, sweeps=1000, alpha=ALPHA, gamma=GAMMA):
+    '''
+    Replays a transition log into Q_table (in place), a dense table or a qstore
+    store. Each sweep computes the targets of every transition from the current
+    table and moves each visited (state, action) towards the mean of its
+    targets, so one sweep is a few array ops over the log. Episode ends have
+    the reward as target, like QLearner.terminal().
+    '''
+    log = np.asarray(log)
+    store = Q_table if hasattr(Q_table, "slots") else DenseStore.from_snapshot(Q_table)
+    slots = store.slots(log['state'])
+    following = store.slots(log['state_new'])
+    rows = store.values  # after the slots, a HashedStore may have grown
+    q = rows.reshape(-1)  # a view, the updates land in the store
+
+    pairs = slots * rows.shape[1] + log['action']
+    visited, inverse, counts = np.unique(pairs, return_inverse=True, return_counts=True)
+    reward = log['reward'].astype(q.dtype)
+    bootstrap = gamma * ~log['done']
+
+    for _ in range(sweeps):
+        target = reward + bootstrap * rows[following].max(axis=1)
+        mean = np.bincount(inverse, weights=target, minlength=len(visited)) / counts
+        q[visited] += alpha * (mean - q[visited])
+    return Q_table
+
+
+class QLearner:
+    '''
+    The Q-table and its epsilon-greedy policy. choose/update/terminal are the
+    steps of one episode, end_episode() decays epsilon, logs and saves the table.
+    The values live in a qstore store (make_store() by default).
+    '''
+    def __init__(self, Q_table=None, recorder=None, snapshots=None, store=None):
+        #Q_table = np.load("qtables/50-qtable.npy")
+        self.store = store or make_store(Q_table)
+        self.recorder = recorder  # TransitionLog of everything learned, for train_offline()
+        self.snapshots = snapshots or SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_DTYPE)
+        self.epsilon = EPSILON
+        self.episode = 0
+        self.log = []
+        self.log_stats = {'ep': [], 'avg': [], 'max': [], 'min': []}
+
+    @property
+    def Q_table(self):
+        # the dense table, or the snapshot of a HashedStore
+        return self.store.snapshot()
+
+    def choose(self, state):
+        if np.random.random() < self.epsilon:
+            # Explore: Get action randomly
+            return np.random.choice(actions)
+        # Exploit: Get action from Q_table
+        row = self.store.slot(state)  # before values, a new state may grow the store
+        return np.argmax(self.store.values[row])
+
+    def update(self, state, action, reward, state_new):
+        row, row_new = self.store.slot(state), self.store.slot(state_new)
+        values = self.store.values
 
         # \max_a Q(s_{t+1}, a)
-        try:
-            Q_next = np.max(Q_table[state_new])
-        except IndexError as e:
-            print(state_new)
-            raise e
+        Q_next = np.max(values[row_new])
 
         # Q(s_t, a_t)
-        Q_current = Q_table[state + (action,)]
+        Q_current = values[row, action]
 
         # Q^{new}(s_t, a_t)
         Q_new = (1 - ALPHA) * Q_current + ALPHA * (reward + GAMMA * Q_next)
 
         # Update the Q table
-        Q_table[state + (action,)] = Q_new
+        values[row, action] = Q_new
+        if self.recorder is not None:
+            self.recorder.record(state, action, reward, state_new, False)
+
+    def choose_batch(self, states):
+        # choose() for a batch of states (one per agent), an array of actions
+        slots = self.store.slots(states)
+        chosen = self.store.values[slots].argmax(axis=1)
+        explore = np.random.random(len(chosen)) < self.epsilon
+        chosen[explore] = np.random.randint(n_actions, size=np.count_nonzero(explore))
+        return chosen
+
+    def update_batch(self, states, actions, rewards, states_new, done):
+        '''
+        update() and terminal() for one step of many agents: the targets come
+        from fancy indexing on the flattened values, and the changes are
+        scattered with np.add.at, averaged over the agents that updated the same
+        (state, action).
+        '''
+        slots, following = self.store.slots(states), self.store.slots(states_new)
+        q = self.store.values.reshape(-1)  # a view, the updates land in the store
+        pairs = slots * n_actions + actions
+
+        Q_next = q.reshape(-1, n_actions)[following].max(axis=1)
+        # terminal(): the final reward replaces the value
+        change = np.where(done, rewards - q[pairs], ALPHA * (rewards + GAMMA * Q_next - q[pairs]))
+        _, inverse, counts = np.unique(pairs, return_inverse=True, return_counts=True)  # O(agents), not O(table)
+        np.add.at(q, pairs, change / counts[inverse])
+        if self.recorder is not None:
+            self.recorder.extend(states, actions, rewards, states_new, done)
+
+    def terminal(self, state, action, reward):
+        row = self.store.slot(state)
+        self.store.values[row, action] = reward
+        if self.recorder is not None:
+            self.recorder.record(state, action, reward, state, True)
+
+    def end_episode(self, reward_total):
+        episode = self.episode
+        self.episode += 1
+
+        if EXPLORATION_END >= episode >= EXPLORATION_BEGIN:
+            self.epsilon -= EPSILON_DECAY
+            self.epsilon = max(self.epsilon, 0)
+
+        self.log.append(reward_total)
+        if not episode % LOG_EVERY:
+            log = self.log
+            self.log_stats['ep'].append(episode)
+            self.log_stats['avg'].append(sum(log) / len(log))
+            self.log_stats['max'].append(max(log))
+            self.log_stats['min'].append(min(log))
+            print(f'Episode: {episode:>5d}, average reward: {sum(log) / len(log):>4.1f}, '
+                  f'current epsilon: {self.epsilon:>1.2f}')
+            self.log = []
+        if not episode % SAVE_EVERY:
+            self.snapshots.save(episode, self.Q_table)  # written in the background
+
+    def close(self):
+        # waits for the snapshots and the transition log to reach the disk
+        self.snapshots.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class LocalLink:
+    '''
+    Stands in for the Receiver link inside the agent host: one per EnviSim
+    session, all of them feeding the same QLearner. Same decide/end calls as
+    Agent_Client_Cognition.LearnerLink, but answered in place (not blocking).
+    '''
+    blocking = False
+
+    def __init__(self, learner: QLearner):
+        self.learner = learner
+        self.last = None  # (state, action) waiting for its outcome
+        self.reward_total = 0
+
+    def decide(self, state, reward):
+        state = tuple(int(s) for s in state)
+        if self.last is not None:
+            self.learner.update(*self.last, reward, state)
+            self.reward_total += reward
 
+        action = int(self.learner.choose(state))
+        self.last = (state, action)
+        return action
+
+    def end(self, reward):
+        if self.last is not None:
+            self.learner.terminal(*self.last, reward)
+        self.reward_total += reward
+        self.learner.end_episode(self.reward_total)
+        self.last = None
+        self.reward_total = 0
+
+
+def main(Q_table=None, record=None, sim=False):
+    import matplotlib.pyplot as plt
+
+    if sim:
+        from wumpus_sim import Simulator
+        env = Simulator()  # headless, no EnviSim
+    else:
+        from receiver import Receiver
+        env = Receiver()  # the enviroment object
+    env.start()
+
+    learner = QLearner(Q_table, TransitionLog(record) if record else None)
+
+    env.check_end()  # waits for the first state
+    for episode in range(EPISODES):
+        state, _ = env.observe()  # starts the env
+        print("state", state)
+
+        reward_total = 0
+
+        while True:
+            action = learner.choose(state)
+
+            env.act(action)
+            done, reward = env.check_end()
+
+            if done:
+                learner.terminal(state, action, reward)
+                reward_total += reward
+                break
+
+            state_new, reward = env.observe()
+            if reward == 50:
+                print(reward)
+            reward_total += reward
+
+            try:
+                learner.update(state, action, reward, state_new)
+            except IndexError as e:
+                print(state_new)
+                raise e
+
+            state = state_new
+
+        learner.end_episode(reward_total)
+
+    learner.close()
+
+    log_stats = learner.log_stats
+    plt.plot(log_stats['ep'], log_stats['avg'], label="average rewards")
+    plt.plot(log_stats['ep'], log_stats['max'], label="max rewards")
+    plt.plot(log_stats['ep'], log_stats['min'], label="min rewards")
+    plt.legend(loc=4)
+    plt.show()
+
+
+def train_batch(agents, Q_table=None, record=None):
+    # the headless loop for many agents at once (BatchSimulator), until EPISODES episodes ended
+    from wumpus_sim import BatchSimulator
+
+    env = BatchSimulator(agents)
+    learner = QLearner(Q_table, TransitionLog(record) if record else None)
+    reward_total = np.zeros(agents)
+
+    state = env.reset()
+    while learner.episode < EPISODES:
+        action = learner.choose_batch(state)
+        state_new, reward, done = env.step(action)
+        learner.update_batch(state, action, reward, state_new, done)
+
+        reward_total += reward
+        for total in reward_total[done]:
+            learner.end_episode(total)
+        reward_total[done] = 0
         state = state_new
 
-    if EXPLORATION_END >= episode >= EXPLORATION_BEGIN:
-        epsilon -= EPSILON_DECAY
-        epsilon = max(epsilon, 0)
-
-    log.append(reward_total)
-    if not episode % LOG_EVERY:
-        log_stats['ep'].append(episode)
-        log_stats['avg'].append(sum(log) / len(log))
-        log_stats['max'].append(max(log))
-        log_stats['min'].append(min(log))
-        print(f'Episode: {episode:>5d}, average reward: {sum(log) / len(log):>4.1f}, current epsilon: {epsilon:>1.2f}')
-        log = []
-    if not episode % SAVE_EVERY:
-        np.save(f"qtables/{episode}-qtable.npy", Q_table)
-
-
-plt.plot(log_stats['ep'], log_stats['avg'], label="average rewards")
-plt.plot(log_stats['ep'], log_stats['max'], label="max rewards")
-plt.plot(log_stats['ep'], log_stats['min'], label="min rewards")
-plt.legend(loc=4)
-plt.show()
\ No newline at end of file
+    learner.close()
+    return learner
+
+
+def offline(path, sweeps, Q_table=None):
+    # learns from a recorded log only, no EnviSim
+    learner = QLearner(Q_table)
+    train_offline(learner.store, TransitionLog.load(path), sweeps)
+    os.makedirs("qtables", exist_ok=True)
+    np.save("qtables/offline-qtable.npy", learner.Q_table)
+    return learner.Q_table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tabular Q-learning for the Wumpus agent.")
+    parser.add_argument("--qtable", default=None, help="initial Q-table (.npy)")
+    parser.add_argument("--store", choices=["dense", "hashed"], default=STORE, help="Q-value backend (qstore)")
+    parser.add_argument("--snapshots", default=SNAPSHOT_DIR,
+                        help="directory for the table snapshots of this run (default: a new qtables/<date-time>)")
+    parser.add_argument("--snapshot-dtype", choices=["float64", "float32", "float16"], default="float64",
+                        help="dtype of the saved tables, float32/float16 give smaller files but round the values")
+    parser.add_argument("--record", default=None, help="log the live transitions to this file")
+    parser.add_argument("--offline", default=None, help="train from this transition log instead of EnviSim")
+    parser.add_argument("--sim", action="store_true", help="train in the local simulator (wumpus_sim) instead of EnviSim")
+    parser.add_argument("--agents", type=int, default=1, help="with --sim, agents stepped together (batched updates)")
+    parser.add_argument("--sweeps", type=int, default=1000, help="passes over the log with --offline")
+    args = parser.parse_args()
+
+    STORE = args.store
+    SNAPSHOT_DIR = args.snapshots
+    SNAPSHOT_DTYPE = np.dtype(args.snapshot_dtype)
+    Q_table = np.load(args.qtable) if args.qtable else None
+    if args.offline:
+        offline(args.offline, args.sweeps, Q_table)
+    elif args.sim and args.agents > 1:
+        train_batch(args.agents, Q_table, args.record)
+    else:
+        main(Q_table, args.record, args.sim)
@@ -0,0 +1,174 @@
+import numpy as np
+
+'''
+Where QLearner keeps its Q-values. A store gives every state a row of action
+values:
+    slot(state)       the row of one state (a tuple), created on first use
+    slots(states)     the rows of a batch of states, (n, dims) array
+    values            (rows, n_actions) array, read/written with the slots
+    snapshot()        an array for snapshots.SnapshotStore, from_snapshot() undoes it
+load_store(table, ...) builds either store from either kind of snapshot.
+DenseStore is the whole n_states table (the row is the flat state index), the
+memory grows with the product of the dimensions. HashedStore only has rows for
+the states visited so far, found through an open addressing table.
+'''
+
+
+def load_store(table, shape, n_actions, hashed=False, low=-1, high=0):
+    '''
+    The store for a saved table: a dense table (shape + [n_actions]) or a
+    HashedStore snapshot (rows, dims + n_actions), turned into the other kind
+    when needed. A dense table becomes one hashed row per state, a hashed
+    snapshot fills its rows of a new uniform(low, high) table.
+    '''
+    table = np.asarray(table)
+    dims = len(shape)
+    if table.shape == tuple(shape) + (n_actions,):
+        if not hashed:
+            return DenseStore(shape, n_actions, table)
+        states = np.indices(shape).reshape(dims, -1).T
+        table = np.concatenate([states, table.reshape(-1, n_actions)], axis=1)
+    elif table.ndim != 2 or table.shape[1] != dims + n_actions:
+        raise ValueError(f"a Q-table of shape {table.shape} is neither {list(shape) + [n_actions]} (dense) "
+                         f"nor (rows, {dims + n_actions}) (hashed snapshot)")
+
+    store = HashedStore.from_snapshot(table, shape, low=low, high=high)
+    if hashed:
+        return store
+    dense = DenseStore(shape, n_actions, low=low, high=high)
+    dense.values[dense.slots(store.states[:store.n])] = store.values
+    return dense
+
+
+class DenseStore:
+    def __init__(self, shape, n_actions, table=None, low=-1, high=0):
+        if table is None:
+            table = np.random.uniform(low=low, high=high, size=list(shape) + [n_actions])
+        self.table = table
+        self.shape = tuple(shape)
+        self.values = table.reshape(-1, n_actions)  # a view of the table
+        self.strides = [int(np.prod(self.shape[i + 1:])) for i in range(len(self.shape))]
+
+    def slot(self, state):
+        if not all(0 <= s < n for s, n in zip(state, self.shape)):
+            raise IndexError(f"state {state} out of {self.shape}")
+        return sum(s * stride for s, stride in zip(state, self.strides))
+
+    def slots(self, states):
+        return np.ravel_multi_index(np.asarray(states).T, self.shape)
+
+    def snapshot(self):
+        return self.table
+
+    @classmethod
+    def from_snapshot(cls, table):
+        return cls(table.shape[:-1], table.shape[-1], table)
+
+
+class HashedStore:
+    '''
+    Rows in first visit order, initialized with uniform(low, high) when a state
+    shows up. The states are packed into one int64 key and found by linear
+    probing in a power of two table of (key, row) buckets, kept at most half
+    full (it doubles and rehashes past that).
+    '''
+    EMPTY = -1
+    PHI = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing
+
+    def __init__(self, shape, n_actions, capacity=1024, low=-1, high=0):
+        self.shape = tuple(shape)
+        self.n_actions = n_actions
+        self.low, self.high = low, high
+        self.strides = [int(np.prod(self.shape[i + 1:], dtype=object)) for i in range(len(self.shape))]
+
+        self.n = 0
+        self.states = np.zeros((capacity // 2, len(self.shape)), dtype=np.int64)  # state of every row
+        self.buffer = np.zeros((capacity // 2, n_actions))
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.bits = capacity.bit_length() - 1
+        self.mask = capacity - 1
+        self.keys = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.rows = np.full(capacity, self.EMPTY, dtype=np.int64)
+
+    @property
+    def values(self):
+        return self.buffer[:self.n]
+
+    def pack(self, states):
+        return (np.asarray(states, dtype=np.int64) * np.array(self.strides, dtype=np.int64)).sum(axis=-1)
+
+    def bucket(self, keys):
+        return ((keys.astype(np.uint64) * self.PHI) >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def find(self, keys):
+        # rows of the packed keys, -1 for the ones not stored
+        bucket = self.bucket(keys)
+        rows = np.full(len(keys), self.EMPTY, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            stored = self.keys[bucket[pending]]
+            hit = stored == keys[pending]
+            rows[pending[hit]] = self.rows[bucket[pending[hit]]]
+            pending = pending[~hit & (stored != self.EMPTY)]
+            bucket[pending] = (bucket[pending] + 1) & self.mask
+        return rows
+
+    def place(self, key, row):
+        b = int(self.bucket(np.array([key]))[0])
+        while self.keys[b] != self.EMPTY:
+            b = (b + 1) & self.mask
+        self.keys[b] = key
+        self.rows[b] = row
+
+    def insert(self, state, key):
+        if 2 * (self.n + 1) > len(self.keys):
+            self.allocate(2 * len(self.keys))
+            self.states = np.resize(self.states, (len(self.keys) // 2, len(self.shape)))
+            self.buffer = np.resize(self.buffer, (len(self.keys) // 2, self.n_actions))
+            for row, old in enumerate(self.pack(self.states[:self.n])):
+                self.place(int(old), row)
+
+        row = self.n
+        self.states[row] = state
+        self.buffer[row] = np.random.uniform(low=self.low, high=self.high, size=self.n_actions)
+        self.place(key, row)
+        self.n += 1
+        return row
+
+    def slot(self, state):
+        if not all(0 <= s < n for s, n in zip(state, self.shape)):
+            raise IndexError(f"state {state} out of {self.shape}")
+        key = sum(s * stride for s, stride in zip(state, self.strides))
+        row = int(self.find(np.array([key], dtype=np.int64))[0])
+        return row if row >= 0 else self.insert(state, key)
+
+    def slots(self, states):
+        states = np.asarray(states, dtype=np.int64)
+        if ((states < 0) | (states >= np.array(self.shape))).any():
+            raise IndexError(f"states out of {self.shape}")
+        keys = self.pack(states)
+        rows = self.find(keys)
+        missing = rows < 0
+        if missing.any():
+            new, first = np.unique(keys[missing], return_index=True)
+            for key, state in zip(new, states[missing][first]):
+                self.insert(state, int(key))
+            rows[missing] = self.find(keys[missing])
+        return rows
+
+    def snapshot(self):
+        # the state of every row in front of its values, (rows, dims + n_actions)
+        return np.concatenate([self.states[:self.n], self.values], axis=1)
+
+    @classmethod
+    def from_snapshot(cls, table, shape, low=-1, high=0):
+        dims = len(shape)
+        store = cls(shape, table.shape[1] - dims, capacity=max(1024, 1 << (2 * len(table)).bit_length()),
+                    low=low, high=high)
+        states = table[:, :dims].astype(np.int64)
+        for state, key in zip(states, store.pack(states)):
+            store.insert(state, int(key))  # same row order as the snapshot
+        store.buffer[:len(table)] = table[:, dims:]
+        return store
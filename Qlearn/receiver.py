@@ -1,102 +1,97 @@
 import socket
-import time
+from collections import deque
 
 import numpy as np
-from threading import Thread
+from threading import Thread, Condition
+
+import shm_link
+from protocol import TRANSPORT, FrameReader, pack
 
 
 class Receiver(Thread):
+    '''
+    Socket side of the Q-learning environment. The Cognition sends protocol frames:
+    a state ("s"), then the reward for it ("r") and waits for the action ("a"), or
+    ends the episode ("e"). Observations and episode ends are queued in arrival
+    order and the action is handed back through the same condition, so both
+    threads sleep until the other one has something for them.
+    '''
     def __init__(self):
         super().__init__()
-        self.end = False
         self.last_reward = None
         self.reward = 0
         self.state = None
-        self.__new_state = False
-        self.__new_reward = False
-        self.__new_action = False
+        self.__events = deque()  # ("s", (state, reward)) or ("e", reward)
         self.__action = None
-        self.__observed = False
-
-        self.soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.soc.connect(("127.0.0.1", 80))
-
-    def __get_state(self, bin):
-        state_ = []
+        self.__cond = Condition()
 
-        for s in bin.decode("ascii").split(','):
-            state_.append(int(s))
-            if int(s) > 8:
-                print(bin)
+        if TRANSPORT == "shm":
+            self.soc = shm_link.connect()
+        else:
+            self.soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.soc.connect(("127.0.0.1", 80))
+            self.soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # small frames go out at once
+        self.reader = FrameReader(self.soc)
 
-        return tuple(state_)
+    def __push(self, event):
+        with self.__cond:
+            self.__events.append(event)
+            self.__cond.notify_all()
 
     def run(self):
-        lt = time.time()
         while True:
-            buff = self.soc.recv(1024)
             try:
-                label = chr(buff[0])
-                data = bytes(buff[1:])
-            except:
-                print(buff)
+                label, data = self.reader.read()
+            except ConnectionError:
+                break
 
             if label == "s":
-                self.__new_state = True
-                self.state = self.__get_state(data)
+                self.state = data
                 # print("state", self.state)
-                self.soc.send(b'0')
 
             elif label == "r":
-                self.__new_reward = True
-                nr = int(data.decode("ascii"))
-                if self.reward == -500:
-                    print("bug")
-
+                nr = data[0]
                 if self.reward == 50 or nr == 50:
                     print("---------- GOT REWARD -------------", nr, "old", self.reward)
                 # print("reward", self.reward)
 
                 self.reward = nr
+                self.__push(("s", (self.state, self.reward)))
+
+                # the Cognition waits for the action of this observation
+                with self.__cond:
+                    self.__cond.wait_for(lambda: self.__action is not None)
+                    action, self.__action = self.__action, None
+                self.soc.sendall(pack("a", action))
 
             elif label == "e":
-                self.end = True
-                self.last_reward = int(data.decode("ascii"))
-                self.soc.send(b'0')
+                self.__push(("e", data[0]))
             else:
                 print(label, data)
 
-            if self.__new_state and self.__new_reward:
-                while not self.__new_action:
-                    pass
-
-                # print("action", self.__action, self.__new_action)
-                lt = time.time()
-                time.sleep(0.1)
-                self.soc.sendall(self.__action.to_bytes(1, "big"))
-                self.__new_state = False
-                self.__new_reward = False
-                self.__new_action = False
-                self.__observed = False
-
-            if time.time() - lt > 1:
-                lt = time.time()
-                # print("action", self.__action, self.__new_action)
-                self.soc.send(self.__action.to_bytes(1, "big"))
     def act(self, action):
-        self.__new_action = True
-        self.__action = int(action)
+        with self.__cond:
+            self.__action = int(action)
+            self.__cond.notify_all()
 
     def observe(self):
-        while self.__observed:
-            time.sleep(0.1)
-        self.__observed = True
-        return self.state, self.reward
+        # blocks until the next state, episode ends queued before it stay for check_end()
+        with self.__cond:
+            self.__cond.wait_for(lambda: any(kind == "s" for kind, _ in self.__events))
+            for event in self.__events:
+                if event[0] == "s":
+                    self.__events.remove(event)
+                    return event[1]
 
     def check_end(self):
-        if self.end:
-            self.end = False
-            return True, self.last_reward
+        # blocks until the outcome of the last action (the episode ended or a new state came)
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.__events)
+            kind, value = self.__events[0]
+            if kind == "e":
+                self.__events.popleft()
+                self.last_reward = value
+                return True, value
         return False, None
 
 if __name__ == "__main__":
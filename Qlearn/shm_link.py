@@ -0,0 +1,139 @@
+import os
+import socket
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+'''
+Same-host transport for the protocol frames: one shared memory block with a byte
+ring per direction and an eventfd doorbell per ring, so a frame costs two memory
+copies and an eventfd write/read instead of a TCP round trip. ShmSocket has the
+two socket methods the link uses (sendall and recv_into), so the FrameReader
+and the code around it don't change.
+
+The Cognition (listen) creates the block and the eventfds and hands them to the
+Receiver (connect) over a unix socket, the block name is unlinked as soon as
+both sides have it mapped. Linux only (eventfd).
+'''
+
+ADDRESS = "\0wumpus_link"  # abstract unix socket, nothing on disk
+RING = struct.Struct("<QQQ")  # written, read, closed
+POSITION = struct.Struct("<Q")
+CAPACITY = 1 << 16
+# polls of the ring before sleeping on the doorbell, only worth it with a core per side
+SPIN = 2000 if (os.cpu_count() or 1) > 1 else 0
+
+
+class Ring:
+    '''
+    Single producer, single consumer byte ring at `offset` of the shared buffer,
+    the producer rings `doorbell` after every write.
+    '''
+    def __init__(self, buf, offset, doorbell):
+        self.buf = buf
+        self.offset = offset
+        self.data = offset + RING.size
+        self.doorbell = doorbell
+
+    def state(self):
+        return RING.unpack_from(self.buf, self.offset)
+
+    def write(self, data):
+        written, read, _ = self.state()
+        n = len(data)
+        if n > CAPACITY - (written - read):
+            # the link never has more than a few frames in flight
+            raise BufferError(f"{n} bytes do not fit in the shared ring")
+
+        at = written % CAPACITY
+        if at + n <= CAPACITY:
+            self.buf[self.data + at:self.data + at + n] = data
+        else:
+            first = CAPACITY - at
+            self.buf[self.data + at:self.data + CAPACITY] = data[:first]
+            self.buf[self.data:self.data + n - first] = data[first:]
+        POSITION.pack_into(self.buf, self.offset, written + n)
+        os.eventfd_write(self.doorbell, 1)
+
+    def read_into(self, view):
+        # blocks until there are bytes (or the other side closed, returns 0 then)
+        spin = SPIN
+        while True:
+            written, read, closed = self.state()
+            if written > read or closed:
+                break
+            if spin:
+                spin -= 1
+            else:
+                os.eventfd_read(self.doorbell)
+
+        n = min(len(view), written - read)
+        at = read % CAPACITY
+        if at + n <= CAPACITY:
+            view[:n] = self.buf[self.data + at:self.data + at + n]
+        else:
+            first = CAPACITY - at
+            view[:first] = self.buf[self.data + at:self.data + CAPACITY]
+            view[first:n] = self.buf[self.data:self.data + n - first]
+        POSITION.pack_into(self.buf, self.offset + 8, read + n)
+        return n
+
+    def close(self):
+        POSITION.pack_into(self.buf, self.offset + 16, 1)
+        os.eventfd_write(self.doorbell, 1)
+
+
+class ShmSocket:
+    def __init__(self, shm, doorbells, side):
+        # side 0 (Cognition) writes ring 0 and reads ring 1, side 1 the other way around
+        self.shm = shm
+        size = RING.size + CAPACITY
+        rings = [Ring(shm.buf, i * size, doorbells[i]) for i in range(2)]
+        self.out, self.inp = rings[side], rings[1 - side]
+        self.doorbells = doorbells
+
+    def sendall(self, data):
+        self.out.write(data)
+
+    def recv_into(self, view):
+        return self.inp.read_into(view)
+
+    def close(self):
+        self.out.close()
+        self.out = self.inp = None
+        self.shm.close()
+        for fd in self.doorbells:
+            os.close(fd)
+
+
+def listen(address=ADDRESS):
+    # Cognition side: waits for the Receiver and hands it the block and the doorbells
+    shm = shared_memory.SharedMemory(create=True, size=2 * (RING.size + CAPACITY))
+    doorbells = [os.eventfd(0), os.eventfd(0)]
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(address)
+        server.listen()
+        conn, _ = server.accept()
+        with conn:
+            socket.send_fds(conn, [shm.name.encode("ascii")], doorbells)
+            conn.recv(1)  # the Receiver mapped the block
+
+    shm.unlink()
+    return ShmSocket(shm, doorbells, 0)
+
+
+def connect(address=ADDRESS):
+    # Receiver side
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(address)
+        name, doorbells, _, _ = socket.recv_fds(conn, 256, 2)
+        # the Cognition owns (and already unlinks) the block, it stays out of this process' resource tracker
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name.decode("ascii"), track=False)
+        else:
+            shm = shared_memory.SharedMemory(name.decode("ascii"))
+            resource_tracker.unregister("/" + shm.name, "shared_memory")  # the POSIX name, with the leading /
+        conn.sendall(b"1")
+
+    return ShmSocket(shm, doorbells, 1)
@@ -0,0 +1,118 @@
+import atexit
+import glob
+import os
+import queue
+import time
+from threading import Thread
+
+import numpy as np
+
+'''
+Q-table history of one run, in its own directory (qtables/<date-time> by
+default, a directory that already has snapshots is never written over), kept
+as one base table plus the changes of every snapshot:
+    base.npy               the first snapshot
+    delta-<episode>.npz    flat indices and new values of the entries changed
+                           since the previous snapshot, and its shape
+                           (savez_compressed)
+The learning loop only copies the table (in the store dtype, float16/float32
+halve or quarter the files) into a queue, the diff and the writes happen on a
+background thread. load(episode) rebuilds the table of any saved episode.
+A table may grow between snapshots (the rows of a qstore.HashedStore are
+appended), the entries past the previous one count as changed.
+'''
+
+
+class SnapshotStore:
+    def __init__(self, directory=None, dtype=np.float64):
+        self.directory = directory  # None: a new one under qtables/ when the first snapshot comes
+        self.dtype = np.dtype(dtype)
+        self.queue = queue.Queue()
+        self.last = None  # the previous snapshot, only touched by the writer thread
+        self.thread = None
+
+    def save(self, episode, Q_table):
+        if self.thread is None:
+            self.start()
+        self.queue.put((episode, Q_table.astype(self.dtype)))  # a copy, the learner goes on updating its table
+
+    def start(self):
+        # a new history, the files of an earlier run are left alone
+        if self.directory is None:
+            self.directory = new_run_directory("qtables")
+        elif self.files():
+            raise FileExistsError(f"{self.directory} already has snapshots of another run")
+        os.makedirs(self.directory, exist_ok=True)
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            episode, table = item
+            if self.last is None:
+                np.save(os.path.join(self.directory, "base.npy"), table)
+                np.save(os.path.join(self.directory, "base-episode.npy"), episode)
+            else:
+                flat, last = table.reshape(-1), self.last.reshape(-1)
+                common = min(len(flat), len(last))
+                changed = np.concatenate([np.flatnonzero(flat[:common] != last[:common]),
+                                          np.arange(common, len(flat))]).astype(np.uint32)
+                np.savez_compressed(os.path.join(self.directory, f"delta-{episode:08d}.npz"),
+                                    index=changed, values=flat[changed], shape=table.shape)
+            self.last = table
+
+    def close(self):
+        # waits for the queued snapshots to be written
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def files(self):
+        return glob.glob(os.path.join(self.directory, "base*.npy")) + \
+            glob.glob(os.path.join(self.directory, "delta-*.npz"))
+
+    def episodes(self):
+        # the saved episodes, oldest first
+        deltas = sorted(glob.glob(os.path.join(self.directory, "delta-*.npz")))
+        base = int(np.load(os.path.join(self.directory, "base-episode.npy")))
+        return [base] + [int(os.path.basename(path)[6:-4]) for path in deltas]
+
+    def load(self, episode=None):
+        # the table of the last snapshot at or before `episode` (the latest one by default)
+        table = np.load(os.path.join(self.directory, "base.npy"))
+        flat = table.reshape(-1)
+        for saved in self.episodes()[1:]:
+            if episode is not None and saved > episode:
+                break
+            with np.load(os.path.join(self.directory, f"delta-{saved:08d}.npz")) as delta:
+                shape = tuple(delta["shape"])
+                if np.prod(shape) != len(flat):
+                    flat = np.resize(flat, np.prod(shape))  # the table grew, the tail is in the delta
+                flat[delta["index"]] = delta["values"]
+            table = flat.reshape(shape)
+        return table
+
+
+def new_run_directory(parent):
+    # parent/<date-time>, with a suffix when another run started in the same second
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for n in range(1000):
+        path = os.path.join(parent, stamp if n == 0 else f"{stamp}-{n}")
+        try:
+            os.makedirs(path)
+            return path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"no free run directory for {stamp} in {parent}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python snapshots.py <run directory> <episode> <out.npy>: exports one table, e.g. for q_learning.py --qtable
+    directory, episode, out = sys.argv[1:4]
+    np.save(out, SnapshotStore(directory).load(int(episode)).astype(np.float64))
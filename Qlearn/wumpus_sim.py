@@ -0,0 +1,223 @@
+import random
+
+import numpy as np
+
+from Agent_Client_Setup import InfoReqSeq, InpSensors
+from Agent_Client_Cognition import encode_senses, shape_reward
+
+'''
+In-process Wumpus world for q_learning.py, so the tabular learner can train
+without EnviSim and the Cognition bridge. Simulator has the Receiver calls
+(start, observe, act, check_end) and hands out what the learner would get over
+the link: the state built by Cognition.encode_senses from the InfoReqSeq
+requests plus has_gold, the reward after Cognition.shape_reward, and the episode
+ends of Mind.end (-50 when the agent dies, Mind.left() when it leaves).
+
+The world follows the outcomes Agent_Client_main reacts to: grabbed (+50 the
+first time), cannot (-5), died, success, collisions with the border (no move),
+the automatic grab after a decision taken on the gold (state CNT) and the
+restart when the energy runs out (no episode end, like EnviSim).
+'''
+
+# the scene, every cell holds the InpSensors code sensed there (the map of DeepQ's game.baseMap)
+scene = np.array([
+    [0, 7, 0, 1, 2, 1, 0, 0, 1, 0],
+    [7, 2, 7, 0, 1, 0, 0, 1, 2, 1],
+    [0, 7, 0, 0, 0, 0, 0, 1, 1, 0],
+    [0, 0, 0, 5, 0, 0, 1, 2, 1, 0],
+    [0, 1, 0, 0, 0, 0, 0, 10, 0, 0],
+    [1, 2, 1, 0, 0, 0, 7, 2, 7, 0],
+    [0, 1, 7, 0, 0, 0, 1, 11, 0, 0],
+    [0, 7, 2, 7, 0, 1, 2, 4, 3, 0],
+    [0, 0, 7, 0, 0, 0, 1, 3, 0, 0],
+    [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+])
+
+ENERGY = 55  # decisions per life, what energy = 500 passes of the FSM in Agent_Client_main lasts
+commands = [0, 1, 3, 11, 12, 13]  # action index -> OutNeurons command, as in Mind.infer
+GRAB, LEAVE, FORWARD = 0, 1, 3
+turns = {11: 3, 12: 1, 13: 2}  # quarter turns to the right of each rotate command
+looks = {'fwd': 0, 'r90': 1, 'l90': 3}  # and of each request direction
+offsets = [(-1, 0), (0, 1), (1, 0), (0, -1)]  # facing up, right, down, left
+DANGER, GOAL, INITIAL = (InpSensors.index('inp_' + name) for name in ('danger', 'goal', 'initial'))
+OBSTRUCTION = InpSensors.index('inp_obstruction')  # a request that leaves the grid
+
+
+class Simulator:
+    def __init__(self, world=scene, energy=ENERGY):
+        self.world = np.asarray(world)
+        self.energy = energy
+        self.start_pos = tuple(int(i) for i in np.argwhere(self.world == INITIAL)[0])
+
+        # the state and the shaped reward (when the outcomes gave none) seen from every (x, y, facing, has_gold)
+        h, w = self.world.shape
+        self.states = {}
+        self.shaped = {}
+        for x in range(h):
+            for y in range(w):
+                for d in range(4):
+                    masks = np.array([1 << self.request((x, y), d, *req) for req in InfoReqSeq], dtype=np.uint32)
+                    senses = encode_senses(masks)
+                    for has_gold in (0, 1):
+                        self.states[x, y, d, has_gold] = tuple(senses) + (has_gold,)
+                        self.shaped[x, y, d, has_gold] = shape_reward(senses, 0, has_gold)
+
+        self.has_gold = 0
+        self.reward = 0  # outcomes since the last observation
+        self.ended = None  # final reward of an episode not yet reported by check_end
+        self.restart()
+
+    def request(self, pos, facing, direction, dist):
+        if direction not in looks:
+            raise ValueError(f"request {direction} is not simulated")
+        dx, dy = offsets[(facing + looks[direction]) % 4]
+        x, y = pos[0] + dist * dx, pos[1] + dist * dy
+        if not (0 <= x < self.world.shape[0] and 0 <= y < self.world.shape[1]):
+            return OBSTRUCTION
+        return int(self.world[x, y])
+
+    def restart(self):
+        self.pos = self.start_pos
+        self.dir = random.randrange(4)
+        self.steps = 0
+
+    def start(self):
+        pass  # nothing to connect to, here for the Receiver interface
+
+    def observe(self):
+        key = self.pos + (self.dir, self.has_gold)
+        reward = self.reward or self.shaped[key]
+        self.reward = 0
+        return self.states[key], reward
+
+    def command(self, command):
+        # applies one command, returns the final reward when it ends the episode
+        if command == GRAB:
+            if self.world[self.pos] == GOAL:
+                if not self.has_gold:
+                    self.reward += 50
+                    self.has_gold = 1
+            else:
+                self.reward -= 5  # cannot
+        elif command == LEAVE:
+            if self.pos == self.start_pos:
+                return 50 if self.has_gold else -50  # success, Mind.left()
+            self.reward -= 5  # cannot
+        elif command == FORWARD:
+            dx, dy = offsets[self.dir]
+            x, y = self.pos[0] + dx, self.pos[1] + dy
+            if 0 <= x < self.world.shape[0] and 0 <= y < self.world.shape[1]:  # otherwise: boundary collision
+                self.pos = (x, y)
+                if self.world[x, y] == DANGER:
+                    return -50  # died
+        else:
+            self.dir = (self.dir + turns[command]) % 4
+        return None
+
+    def act(self, action):
+        on_gold = self.world[self.pos] == GOAL
+        ended = self.command(commands[action])
+        if ended is None and on_gold:
+            ended = self.command(GRAB)  # state CNT: the decision was taken on the gold, grab follows
+
+        self.steps += 1
+        if ended is not None:
+            self.ended = ended
+            self.has_gold = 0
+            self.reward = 0
+            self.restart()
+        elif self.steps >= self.energy:
+            self.restart()  # out of energy: a new mission, the episode goes on
+
+    def check_end(self):
+        if self.ended is None:
+            return False, None
+        reward, self.ended = self.ended, None
+        return True, reward
+
+
+class BatchSimulator:
+    '''
+    M agents in their own copy of the world, stepped together. Same rules as
+    Simulator, with the state of every agent in arrays and the observations
+    looked up in the Simulator tables turned into arrays.
+    '''
+    def __init__(self, agents, world=scene, energy=ENERGY):
+        single = Simulator(world, energy)
+        self.world = single.world
+        self.energy = energy
+        self.start_pos = single.start_pos
+        h, w = self.world.shape
+        grid = [(x, y, d, g) for x in range(h) for y in range(w) for d in range(4) for g in (0, 1)]
+        self.states = np.array([single.states[key] for key in grid], dtype=np.uint8).reshape(h, w, 4, 2, -1)
+        self.shaped = np.array([single.shaped[key] for key in grid]).reshape(h, w, 4, 2)
+
+        self.commands = np.array(commands)
+        self.turns = np.zeros(max(commands) + 1, dtype=np.int64)
+        self.turns[list(turns)] = list(turns.values())
+        self.offsets = np.array(offsets)
+
+        self.x = np.zeros(agents, dtype=np.int64)
+        self.y = np.zeros(agents, dtype=np.int64)
+        self.dir = np.zeros(agents, dtype=np.int64)
+        self.steps = np.zeros(agents, dtype=np.int64)
+        self.has_gold = np.zeros(agents, dtype=np.int64)
+        self.reward = np.zeros(agents, dtype=np.int64)  # outcomes since the last observation
+
+    def restart(self, agents):
+        self.x[agents], self.y[agents] = self.start_pos
+        self.dir[agents] = np.random.randint(4, size=np.count_nonzero(agents))
+        self.steps[agents] = 0
+
+    def reset(self):
+        everyone = np.ones(len(self.x), dtype=bool)
+        self.has_gold[:] = 0
+        self.reward[:] = 0
+        self.restart(everyone)
+        return self.observe()[0]
+
+    def observe(self):
+        key = (self.x, self.y, self.dir, self.has_gold)
+        reward = np.where(self.reward != 0, self.reward, self.shaped[key])
+        self.reward[:] = 0
+        return self.states[key], reward
+
+    def grab(self, agents):
+        here = self.world[self.x, self.y] == GOAL
+        self.reward[agents & here & (self.has_gold == 0)] += 50
+        self.has_gold[agents & here] = 1
+        self.reward[agents & ~here] -= 5  # cannot
+
+    def step(self, actions):
+        # returns the next states (the first of a new episode where one ended), the rewards
+        # (the final one where the episode ended) and which agents ended an episode
+        command = self.commands[actions]
+        on_gold = self.world[self.x, self.y] == GOAL
+        final = np.zeros(len(command), dtype=np.int64)
+
+        self.grab(command == GRAB)
+
+        leave = command == LEAVE
+        at_start = (self.x == self.start_pos[0]) & (self.y == self.start_pos[1])
+        ended = leave & at_start  # success, Mind.left()
+        final[ended] = np.where(self.has_gold[ended] == 1, 50, -50)
+        self.reward[leave & ~at_start] -= 5  # cannot
+
+        x = self.x + self.offsets[self.dir, 0]
+        y = self.y + self.offsets[self.dir, 1]
+        forward = (command == FORWARD) & (0 <= x) & (x < self.world.shape[0]) & (0 <= y) & (y < self.world.shape[1])
+        self.x[forward], self.y[forward] = x[forward], y[forward]
+        died = forward & (self.world[self.x, self.y] == DANGER)
+        final[died] = -50
+        ended |= died
+
+        self.dir = (self.dir + self.turns[command]) % 4
+        self.grab(on_gold & ~ended)  # state CNT
+
+        self.steps += 1
+        self.has_gold[ended] = 0
+        self.reward[ended] = 0
+        self.restart(ended | (self.steps >= self.energy))
+
+        states, reward = self.observe()
+        return states, np.where(ended, final, reward), ended